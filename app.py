@@ -6,6 +6,9 @@ import logging
 import time
 import os
 
+from lock_policy import LockPolicy
+from latency import LatencyTracker
+
 # Optional imports for camera functionality
 try:
     import cv2
@@ -49,13 +52,48 @@ DEFAULT_BG = "#f5f5f5"  # light grey
 DEFAULT_FG = "#333333"  # dark grey
 BUTTON_BG = "#ffffff"
 
+
+def _env_number(name, default, cast=float):
+    """Returns the numeric value of an environment variable, the default if unset or invalid"""
+    value = os.environ.get(name)
+    if not value:
+        return default
+    try:
+        return cast(value)
+    except ValueError:
+        logger.exception("Invalid %s=%r, using %r", name, value, default)
+        return default
+
+
+# Speed/accuracy profile (low-power, balanced or accurate)
+PROFILE_NAME = os.environ.get("PRIVACY_PROFILE", "balanced")
+# Directory where landmark traces are recorded for offline re-scoring (disabled if unset)
+TRACE_DIR = os.environ.get("PRIVACY_TRACE")
+# Look-away -> lock latency SLO in seconds (disabled if unset)
+LOCK_SLO = _env_number("PRIVACY_LOCK_SLO", None)
+# Refresh rate of the annotated camera preview, independent of capture (disabled if unset or 0)
+PREVIEW_FPS = _env_number("PRIVACY_PREVIEW_FPS", 0.0)
+PREVIEW_WIDTH = 240
+# Threads analyzing both eyes of a frame concurrently (0 to analyze them one after the other)
+EYE_WORKERS = max(0, _env_number("PRIVACY_EYE_WORKERS", 0, int))
+# Skip the dlib pipeline while the desk is empty (set to 0 to analyze every detection frame)
+PRESENCE = os.environ.get("PRIVACY_PRESENCE", "1") != "0"
+# Run the fast tier (pupils only, in the last eye regions) on the frames between two detections
+TWO_TIER = os.environ.get("PRIVACY_TWO_TIER") == "1"
+# Milliseconds between captured frames, and while nobody is at the desk
+FRAME_DELAY_MS = 15
+IDLE_FRAME_DELAY_MS = 100
+
 # Optional import for gaze attention
 try:
-    from gaze_detect import getGazeAttention, are_there_multiple_faces
-    logger.debug("Imported getGazeAttention and are_there_multiple_faces from gaze_detect")
+    from gaze_detect import GazeDetector, are_there_multiple_faces, DEGRADATION_LEVELS
+    from gaze_tracking import get_profile, TraceWriter
+    logger.debug("Imported GazeDetector and are_there_multiple_faces from gaze_detect")
 except Exception:
-    getGazeAttention = None
+    GazeDetector = None
     are_there_multiple_faces = None
+    get_profile = None
+    TraceWriter = None
     logger.exception("Failed to import gaze detection helpers; gaze features disabled")
 
 
@@ -97,15 +135,40 @@ class PrivacyApp:
         self.cap = None
         self.running = False
         self.frame_counter = 0
-        self.gaze_interval = 10 # call gaze detection every N frames
+        self.trace = None
+        # per-session gaze detector: keeps the calibration and falls back to cheaper
+        # detection paths when the profile's detection budget is tight
+        self.detector = None
+        # Speed/accuracy profile shared with gaze_detect and gaze_tracking
+        self.profile = None
+        if get_profile is not None:
+            try:
+                self.profile = get_profile(PROFILE_NAME)
+            except ValueError:
+                logger.exception("Invalid profile %r, using the default one", PROFILE_NAME)
+                self.profile = get_profile()
+            logger.info("Using profile %s", self.profile.name)
+        self.gaze_interval = self.profile.gaze_interval if self.profile else 10 # call gaze detection every N frames
         self.last_attention = None
+        # False while the presence pre-filter finds the desk empty; frames are then captured less often
+        self.user_present = True
         # FPS tracking
         self.fps = 0.0
         self._last_time = time.time()
-        # lock-status tracking
-        self.low_threshold = 40.0  # percent
-        self.required_consecutive = 2
-        self.consecutive_low_count = 0
+        # lock-status tracking: lock after two consecutive detections below 40%,
+        # or as soon as someone besides the user is looking at the screen. With the
+        # fast tier every frame is a sample, so the low run is counted in frames
+        # spanning the same time as two detections
+        required_consecutive = self.gaze_interval + 1 if TWO_TIER else 2
+        self.lock_policy = LockPolicy(low_threshold=40.0, required_consecutive=required_consecutive, onlooker_threshold=50.0)
+        # last sample fed to the lock policy: (attention, one_face, onlooker_attention, blink_ratio)
+        self._detection = (None, False, [], None)
+        self._detection_captured_at = None
+        # capture -> result and look-away -> lock latencies; a breach of the SLO
+        # generates a <<LatencySLOBreach>> event on the root window
+        self.latency = LatencyTracker(lock_slo=LOCK_SLO, on_breach=self._on_latency_breach)
+        # onlooker tracking: analyze every face in one detection pass
+        self.multi_face = True
 
         # Frame layout
         frame = tk.Frame(root, bg=DEFAULT_BG)
@@ -147,13 +210,27 @@ class PrivacyApp:
         label.pack(pady=(6, 0))
 
         # Attention display (text only) - shown above the camera button
-        self.video_width = 600
-        self.video_height = 400
+        self.video_width = self.profile.video_width if self.profile else 600
+        self.video_height = self.profile.video_height if self.profile else 400
 
         self.attention_var = tk.StringVar(value="Attention: N/A")
         self.attention_label = tk.Label(frame, textvariable=self.attention_var, font=font.Font(family="Segoe UI", size=14), fg=DEFAULT_FG, bg=DEFAULT_BG)
         self.attention_label.pack(pady=(2, 6))
 
+        # Optional camera preview showing the last detection drawn on the latest frame.
+        # It is refreshed by its own timer at PREVIEW_FPS, downscaled once to the display
+        # size and pasted into a single PhotoImage reused for the whole session
+        self.preview_photo = None
+        self._preview_frame = None
+        self._preview_job = None
+        if PREVIEW_FPS > 0 and Image is not None and ImageTk is not None:
+            self.preview_size = (PREVIEW_WIDTH, round(PREVIEW_WIDTH * self.video_height / self.video_width))
+            self.preview_photo = ImageTk.PhotoImage("RGB", self.preview_size)
+            self.preview_label = tk.Label(frame, image=self.preview_photo, bg=DEFAULT_BG)
+            self.preview_label.pack(pady=(0, 6))
+            h += self.preview_size[1] + 6
+            root.geometry(f"{w}x{h}+{x}+{y - (self.preview_size[1] + 6) // 2}")
+
         # Camera start/stop button with icon
         # load eye-test icon (slightly larger for the bigger button)
         eye_icon_path = os.path.join(assets_dir, "eye-test.png")
@@ -275,9 +352,24 @@ class PrivacyApp:
         self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.video_width)
         self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.video_height)
 
+        if TRACE_DIR and TraceWriter is not None:
+            trace_path = os.path.join(TRACE_DIR, time.strftime('trace_%Y%m%d-%H%M%S'))
+            self.trace = TraceWriter(trace_path, profile=self.profile, multi_face=self.multi_face)
+            logger.info("Recording landmark trace to %s", trace_path)
+
+        if GazeDetector is not None:
+            try:
+                self.detector = GazeDetector(multi_face=self.multi_face, profile=self.profile, trace=self.trace,
+                                             eye_workers=EYE_WORKERS, presence=PRESENCE)
+            except Exception:
+                logger.exception("Failed to create the gaze detector; gaze features disabled")
+                self.detector = None
+
         self.running = True
         self.camera_button.config(text="Stop Camera")
         self.update_frame()
+        if self.preview_photo is not None:
+            self.update_preview()
 
     def stop_camera(self):
         self.running = False
@@ -288,10 +380,28 @@ class PrivacyApp:
             except Exception:
                 pass
             self.cap = None
+        if self._preview_job is not None:
+            self.root.after_cancel(self._preview_job)
+            self._preview_job = None
+        self._preview_frame = None
+        if self.preview_photo is not None:
+            self.preview_photo.paste(Image.new("RGB", self.preview_size, DEFAULT_BG))
+        self.detector = None
+        if self.trace is not None:
+            try:
+                self.trace.close()
+            except Exception:
+                logger.exception("Failed to write landmark trace to %s", self.trace.path)
+            self.trace = None
         # Reset attention display
         self.attention_var.set("Attention: N/A")
         # Reset lock status
-        self.consecutive_low_count = 0
+        self.lock_policy.reset()
+        self._detection = (None, False, [], None)
+        self._detection_captured_at = None
+        self.user_present = True
+        logger.info("Latency summary: %r", self.latency.summary())
+        self.latency.reset()
         self.status_var.set("Screen unlocked")
         try:
             if self.unlocked_icon is not None:
@@ -308,11 +418,15 @@ class PrivacyApp:
             # Try again shortly; sometimes the first frames fail
             self.root.after(50, self.update_frame)
             return
-        # Resize frame for processing (we do not display it)
+        # Monotonic capture stamp, carried through detection to the lock decision
+        captured_at = time.monotonic()
+        # Resize frame for processing (displayed only by the optional preview)
         try:
             frame_proc = cv2.resize(frame, (self.video_width, self.video_height))
         except Exception:
             frame_proc = frame
+        # Latest frame for the preview; detection works on a copy so no copy is needed here
+        self._preview_frame = frame_proc
 
         # Update face-count status for this frame (if available)
         # if are_there_multiple_faces is not None:
@@ -326,29 +440,15 @@ class PrivacyApp:
         #         logger.exception("are_there_multiple_faces failed on frame %d", self.frame_counter)
 
         # Occasionally run the gaze attention detector (expensive)
-        if getGazeAttention is None:
+        if self.detector is None:
             if self.frame_counter == 0:
-                logger.warning("Gaze detection unavailable (getGazeAttention is None)")
+                logger.warning("Gaze detection unavailable (no gaze detector)")
         elif (self.frame_counter % self.gaze_interval == 0):
             try:
-                logger.debug("Calling getGazeAttention frame=%d", self.frame_counter)
-                result = getGazeAttention(frame_proc.copy(), self.frame_counter)
-                logger.debug("getGazeAttention returned: %r", result)
-
-                # Support both legacy single-value return and new (attention, multiple_faces)
-                one_face = None
-                if isinstance(result, (list, tuple)) and len(result) >= 2:
-                    attention_val, one_face = result[0], result[1]
-                else:
-                    attention_val = result
-
-                try:
-                    self.last_attention = float(attention_val)
-                    if (one_face is not None and one_face):
-                        self.last_attention = max(attention_val, 50.0)
-                except Exception:
-                    logger.exception("Failed to parse attention value: %r", attention_val)
-                    self.last_attention = None
+                logger.debug("Calling GazeDetector.detect frame=%d", self.frame_counter)
+                result = self.detector.detect(frame_proc.copy(), self.frame_counter, captured_at)
+                logger.debug("GazeDetector.detect returned: %r", result)
+                self._take_detection(result, captured_at)
 
                 # Update faces label if we received face-count info
                 # if multiple_faces is not None:
@@ -361,31 +461,12 @@ class PrivacyApp:
                 #         logger.exception("Failed updating faces label")
 
             except Exception:
-                logger.exception("getGazeAttention failed on frame %d", self.frame_counter)
+                logger.exception("Gaze detection failed on frame %d", self.frame_counter)
 
-            # Update consecutive-low counter and status when detection runs
-            try:
-                if self.last_attention is not None and self.last_attention < self.low_threshold:
-                    self.consecutive_low_count += 1
-                else:
-                    self.consecutive_low_count = 0
-
-                if self.consecutive_low_count >= self.required_consecutive:
-                    self.status_var.set("Screen locked")
-                    try:
-                        if self.padlock_icon is not None:
-                            self.status_label.config(image=self.padlock_icon)
-                    except Exception:
-                        pass
-                else:
-                    self.status_var.set("Screen unlocked")
-                    try:
-                        if self.unlocked_icon is not None:
-                            self.status_label.config(image=self.unlocked_icon)
-                    except Exception:
-                        pass
-            except Exception:
-                logger.exception("Failed updating lock-status tracking")
+            # Update lock decision when detection runs (the previous detection is reused if this one failed)
+            self._decide()
+        elif TWO_TIER:
+            self._track_frame(frame_proc, captured_at)
 
         self.frame_counter += 1
 
@@ -399,13 +480,125 @@ class PrivacyApp:
         self._last_time = now
 
         # Update attention label text (show only attention value)
-        if self.last_attention is not None:
+        if not self.user_present:
+            self.attention_var.set("Attention: no user")
+        elif self.last_attention is not None:
             self.attention_var.set(f"Attention: {self.last_attention:.1f}%")
         else:
             self.attention_var.set("Attention: N/A")
 
-        # Schedule next frame
-        self.root.after(15, self.update_frame)
+        # Schedule next frame, less often while nobody is at the desk
+        self.root.after(FRAME_DELAY_MS if self.user_present else IDLE_FRAME_DELAY_MS, self.update_frame)
+
+    def _decide(self):
+        """Feeds the last sample to the lock policy and updates the lock status"""
+        try:
+            locked = self.lock_policy.update(*self._detection)
+            self.last_attention = self.lock_policy.attention
+            if self._detection_captured_at is not None:
+                # An unknown attention must not pass for an attentive user
+                away = None if self._detection[0] is None else self.lock_policy.consecutive_low_count > 0
+                self.latency.record_decision(self._detection_captured_at, away, locked)
+            if self.lock_policy.onlooker_detected:
+                logger.warning("Onlooker looking at the screen on frame %d: %r", self.frame_counter, self._detection[2])
+
+            if locked:
+                self.status_var.set("Screen locked")
+                try:
+                    if self.padlock_icon is not None:
+                        self.status_label.config(image=self.padlock_icon)
+                except Exception:
+                    pass
+            else:
+                self.status_var.set("Screen unlocked")
+                try:
+                    if self.unlocked_icon is not None:
+                        self.status_label.config(image=self.unlocked_icon)
+                except Exception:
+                    pass
+        except Exception:
+            logger.exception("Failed updating lock-status tracking")
+
+    def _take_detection(self, result, captured_at):
+        """Takes the result of a full detection (scheduled, or a fast tier
+        fallback) into account: latency, user presence, degradation, and the
+        sample for the next lock decision"""
+        self.latency.record_result(captured_at)
+        present = getattr(result, 'present', True)
+        if present != self.user_present:
+            logger.info("User %s on frame %d", "present" if present else "absent", self.frame_counter)
+        self.user_present = present
+        if getattr(result, 'degradation', 0):
+            logger.info("Detection degraded to %s on frame %d", DEGRADATION_LEVELS[result.degradation], self.frame_counter)
+
+        # Support both legacy single-value return and new (attention, multiple_faces, onlookers, blink_ratio)
+        one_face = None
+        onlooker_attention = []
+        blink_ratio = None
+        if isinstance(result, (list, tuple)) and len(result) >= 2:
+            attention_val, one_face = result[0], result[1]
+            if len(result) >= 4:
+                onlooker_attention, blink_ratio = result[2], result[3]
+            elif len(result) >= 3:
+                onlooker_attention = result[2]
+        else:
+            attention_val = result
+
+        try:
+            attention_val = float(attention_val) if attention_val is not None else None
+        except Exception:
+            logger.exception("Failed to parse attention value: %r", attention_val)
+            attention_val = None
+        self._detection = (attention_val, bool(one_face), list(onlooker_attention), blink_ratio)
+        self._detection_captured_at = captured_at
+
+    def _track_frame(self, frame, captured_at):
+        """Runs the fast tier on a frame between two detections and feeds its
+        attention and onlookers to the lock policy"""
+        try:
+            result = self.detector.track(frame.copy(), self.frame_counter, captured_at)
+            if result is not None and not result.fast:
+                # The fast tier fell back on a full detection
+                self._take_detection(result, captured_at)
+            elif result is not None:
+                attention = float(result.attention) if result.attention is not None else None
+                self._detection = (attention, bool(result.one_face), list(result.onlooker_attention), result.blink_ratio)
+                self._detection_captured_at = captured_at
+        except Exception:
+            logger.exception("Fast tier failed on frame %d", self.frame_counter)
+        # Without a fast tier result the last sample stands for this frame, as the
+        # low run is counted in frames
+        self._decide()
+
+    def update_preview(self):
+        """Shows the latest camera frame, annotated with the last detection, in the
+        preview panel; runs on its own timer at most PREVIEW_FPS times per second"""
+        self._preview_job = None
+        if not self.running or self.preview_photo is None:
+            return
+
+        start = time.perf_counter()
+        frame = self._preview_frame
+        # Only redraw when a new frame has been captured since the last refresh
+        self._preview_frame = None
+        if frame is not None:
+            try:
+                if self.detector is not None:
+                    frame = self.detector.gaze.annotated_frame(frame)
+                small = cv2.resize(frame, self.preview_size, interpolation=cv2.INTER_AREA)
+                self.preview_photo.paste(Image.fromarray(cv2.cvtColor(small, cv2.COLOR_BGR2RGB)))
+            except Exception:
+                logger.exception("Failed to update the camera preview")
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self._preview_job = self.root.after(max(1, int(1000 / PREVIEW_FPS - elapsed_ms)), self.update_preview)
+
+    def _on_latency_breach(self, event):
+        logger.warning("Lock latency SLO breached: %r", event)
+        try:
+            self.root.event_generate("<<LatencySLOBreach>>", when="tail")
+        except Exception:
+            logger.exception("Failed to generate latency SLO event")
 
     def close(self):
         self.stop_camera()
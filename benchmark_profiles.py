@@ -0,0 +1,88 @@
+"""Benchmarks the speed/accuracy profiles on reference footage.
+
+Usage:
+    python benchmark_profiles.py footage.mp4 --labels labels.csv
+
+For every profile the footage is replayed at the profile resolution and gaze
+detection runs every gaze_interval frames, like PrivacyApp does. The report
+gives the CPU time per detection, the share of one core spent on detection in
+real time, the wall-clock time per detection and, when labels are given, the fraction of detections whose
+attention falls on the right side of the lock threshold.
+"""
+import argparse
+import time
+import cv2
+from gaze_tracking import GazeTracking, PROFILES, get_profile, eye_executor
+from gaze_detect import face_attention
+from labels import load_labels, label_at
+
+
+def benchmark(path, profile, labels=None, low_threshold=40.0, eye_workers=0):
+    """Replays the footage with the given profile and returns a dict of measurements"""
+    profile = get_profile(profile)
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise IOError(f"Could not open {path}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+
+    executor = eye_executor(eye_workers) if eye_workers else None
+    gaze = GazeTracking(multi_face=True, profile=profile, executor=executor)
+    frame_index = 0
+    detections = 0
+    cpu_time = 0.0
+    wall_time = 0.0
+    correct = 0
+    labelled = 0
+
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        if frame_index % profile.gaze_interval == 0:
+            frame = cv2.resize(frame, (profile.video_width, profile.video_height))
+            start, wall_start = time.process_time(), time.perf_counter()
+            gaze.refresh(frame)
+            attention = face_attention(gaze.faces)
+            cpu_time += time.process_time() - start
+            wall_time += time.perf_counter() - wall_start
+            detections += 1
+
+            expected = label_at(labels, frame_index / fps) if labels else None
+            if expected is not None:
+                attentive = bool(attention) and attention[0] >= low_threshold
+                correct += attentive == expected
+                labelled += 1
+        frame_index += 1
+    cap.release()
+
+    duration = frame_index / fps
+    return {
+        'profile': profile.name,
+        'detections': detections,
+        'cpu_ms_per_detection': 1000.0 * cpu_time / detections if detections else 0.0,
+        'cpu_percent': 100.0 * cpu_time / duration if duration else 0.0,
+        'wall_ms_per_detection': 1000.0 * wall_time / detections if detections else 0.0,
+        'accuracy': correct / labelled if labelled else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the speed/accuracy profiles on reference footage")
+    parser.add_argument("footage", help="Video file to replay")
+    parser.add_argument("--labels", help="CSV of labelled attention intervals (start,end,attentive)")
+    parser.add_argument("--profiles", nargs="+", default=list(PROFILES), help="Profiles to benchmark")
+    parser.add_argument("--low-threshold", type=float, default=40.0, help="Attention below which the user counts as away")
+    parser.add_argument("--eye-workers", type=int, default=0, help="Threads analyzing the eyes of a frame concurrently")
+    args = parser.parse_args()
+
+    labels = load_labels(args.labels) if args.labels else None
+
+    print(f"{'profile':<12}{'detections':>12}{'cpu ms/det':>12}{'cpu %':>8}{'wall ms/det':>13}{'accuracy':>10}")
+    for name in args.profiles:
+        r = benchmark(args.footage, name, labels, args.low_threshold, args.eye_workers)
+        accuracy = f"{r['accuracy']:.1%}" if r['accuracy'] is not None else "n/a"
+        print(f"{r['profile']:<12}{r['detections']:>12}{r['cpu_ms_per_detection']:>12.1f}{r['cpu_percent']:>8.1f}{r['wall_ms_per_detection']:>13.1f}{accuracy:>10}")
+
+
+if __name__ == "__main__":
+    main()
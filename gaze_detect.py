@@ -1,40 +1,59 @@
-from gaze_tracking import GazeTracking
+from gaze_tracking import GazeTracking, PresenceDetector, get_profile, load_models, eye_executor
 import cv2
 import logging
 import os
 import time
-from scipy.spatial import distance
+from collections import namedtuple
 import concurrent.futures
+import numpy as np
 
 # Single-threaded executor for asynchronous file writes
 _executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
 
 MODELS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models')
 FRAMES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'annotated_frames')
-face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
 
+# Result of a gaze detection pass. It unpacks like the legacy (attention, one_face)
+# pair; onlooker_attention lists the attention of every non-primary face (multi-face mode).
+# blink_ratio is the primary user's blinking ratio (None when no face was analyzed),
+# captured_at the monotonic capture timestamp of the frame and degradation the
+# index in DEGRADATION_LEVELS of the path the detection took.
+GazeResult = namedtuple('GazeResult', ['attention', 'one_face', 'onlooker_attention', 'blink_ratio', 'captured_at',
+                                       'degradation', 'present', 'fast'],
+                        defaults=[None, None, 0, True, False])
 
-def detect(gray, frame):
+# Detection paths from the most complete to the cheapest; each level also
+# drops what the previous ones drop.
+DEGRADATION_LEVELS = ['full', 'no-face-count', 'no-annotation', 'low-scale', 'reused-landmarks']
+FULL, NO_FACE_COUNT, NO_ANNOTATION, LOW_SCALE, REUSED_LANDMARKS = range(len(DEGRADATION_LEVELS))
+
+
+def _detect_faces(gray, profile=None, models=None):
+    profile = get_profile(profile)
+    face_cascade = (models or load_models()).face_cascade
+    return face_cascade.detectMultiScale(gray, profile.cascade_scale_factor, profile.cascade_min_neighbors)
+
+def detect(gray, frame, profile=None):
     all_roi_faces=[]
     all_coordinates=[]
-    faces = face_cascade.detectMultiScale(gray, 1.3, 5)
+    faces = _detect_faces(gray, profile)
     for i,(x, y, w, h) in enumerate(faces):
         roi_color = frame[y:y+h, x:x+w]
         all_roi_faces.append(roi_color)
         all_coordinates.append([x+(w/2), y+(h/2)])
     return all_roi_faces,all_coordinates
 
-def are_there_multiple_faces(image):
+def are_there_multiple_faces(image, profile=None):
     gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    faces = face_cascade.detectMultiScale(gray, 1.3, 5)
+    faces = _detect_faces(gray, profile)
     if len(faces) > 1:
         return True
     else:
         return False
 
-def is_there_one_face(image):
+def is_there_one_face(image, profile=None, models=None):
     gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    faces = face_cascade.detectMultiScale(gray, 1.3, 5)
+    faces = _detect_faces(gray, profile, models)
     print(len(faces))
     print(faces)
     if len(faces) == 1:
@@ -42,80 +61,315 @@ def is_there_one_face(image):
     else:
         return False
 
-def getGazeAttention(image, frame_counter):
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) #converts frames to gray scale
-    image_x = gray.shape[0]
-    image_y = gray.shape[1]
+def attention_scores(pupils, centers, threshold=0.16, fallback=0.6):
+    """Returns the attention percentage (0-100) of each face as a (N,) array.
+
+    The metric is the distance between each pupil and its eye frame center,
+    normalized by the eye frame size and averaged over both eyes.
+
+    Arguments:
+        pupils (numpy.ndarray): (N, 2, 2) pupil positions in their eye frames
+        centers (numpy.ndarray): (N, 2, 2) centers of the eye frames
+        threshold (float): Metric below which the face is considered attentive
+        fallback (float): Above the threshold, the attention is fallback - metric
+    """
+    offsets = np.hypot(*np.moveaxis(pupils - centers, -1, 0))
+    metrics = (offsets / (centers[..., 0] * np.sqrt(2))).mean(axis=-1)
+    attention = np.where(metrics < threshold, 1.0 - metrics, np.maximum(fallback - metrics, 0.0))
+    return attention * 100
+
+
+def face_attention(faces, threshold=0.16):
+    """Returns the attention percentage of each Face, 0.0 where pupils were not located"""
+    attention = np.zeros(len(faces))
+    located = [i for i, face in enumerate(faces) if face.pupils_located]
+    if located:
+        pupils = np.stack([faces[i].pupils for i in located])
+        centers = np.stack([faces[i].centers for i in located])
+        attention[located] = attention_scores(pupils, centers, threshold)
+    return attention.tolist()
+
+
+class GazeDetector(object):
+    """
+    This class runs gaze detection for one camera stream. It keeps the
+    stream's GazeTracking, and so its calibration, between frames, while
+    the dlib and cascade models are shared by every detector of the process.
+
+    Detection runs against a time budget counted from the frame capture.
+    The detector keeps a moving average of the cost of each stage and, when
+    the full pipeline would not fit in what is left of the budget, falls
+    back to cheaper paths (see DEGRADATION_LEVELS).
+    """
 
-    x_mid = image_x/2
-    y_mid = image_y/2
+    # Moving average weight of the last stage timing
+    TIMING_ALPHA = 0.2
 
-    del_x=0
-    del_y=0
+    def __init__(self, multi_face=False, profile=None, trace=None, save_frames=True, models=None, budget=None,
+                 low_scale=0.5, max_reuse=3, eye_workers=0, presence=False, max_change=0.1):
+        """
+        Arguments:
+            budget (float): Seconds from capture to result, the profile's detection_budget if None
+            low_scale (float): Scale of the frame the face detector runs on at the low-scale level
+            max_reuse (int): Consecutive detections that may reuse the previous landmarks
+            eye_workers (int): Threads analyzing the eyes of a frame concurrently, 0 to
+                analyze them one after the other
+            presence (bool): Skip the analysis of frames the presence pre-filter finds
+                empty (see PresenceDetector)
+            max_change (float): Change of the eye regions above which the fast tier
+                hands the frame to a full detection (see track)
+        """
+        self.multi_face = multi_face
+        self.profile = get_profile(profile)
+        self.trace = trace
+        self.save_frames = save_frames
+        self.models = models if models is not None else load_models()
+        executor = eye_executor(eye_workers) if eye_workers else None
+        self.gaze = GazeTracking(multi_face=multi_face, profile=self.profile, models=self.models, executor=executor)
+        self.budget = budget if budget is not None else self.profile.detection_budget
+        self.low_scale = low_scale
+        self.max_reuse = max_reuse
+        self.timings = {'detect': 0.0, 'landmarks': 0.0, 'eyes': 0.0, 'count': 0.0, 'annotate': 0.0}
+        self._reused = 0
+        self.presence = PresenceDetector() if presence else None
+        self.max_change = max_change
+        self._one_face = False
+        # Set when a fast tier fallback found no pupils either, until the next scheduled detection
+        self._untrackable = False
 
-    threshold = 0.16
+    def _update_timing(self, stage, seconds):
+        self.timings[stage] += self.TIMING_ALPHA * (seconds - self.timings[stage])
 
-    gaze = GazeTracking()
-    print("Gaze Tracking")
+    def _skip_timing(self, stage):
+        """Decays the estimate of a stage skipped to fit the budget: it is only
+        measured when it runs, so one slow sample would otherwise keep it
+        skipped for good. Once the estimate fits again the stage runs and is
+        measured anew."""
+        self.timings[stage] *= 1 - self.TIMING_ALPHA
 
-    gaze.refresh(image)
-    text=""
+    def _plan(self, remaining):
+        """Returns the lowest degradation level expected to fit in the remaining seconds"""
+        t = self.timings
+        eyes = t['eyes']
+        full = t['detect'] + t['landmarks'] + eyes
+        costs = [
+            full + t['count'] + t['annotate'],
+            full + t['annotate'],
+            full,
+            t['detect'] * self.low_scale ** 2 + t['landmarks'] + eyes,
+            eyes,
+        ]
+        can_reuse = self.gaze.trackable and self._reused < self.max_reuse
+        last = REUSED_LANDMARKS if can_reuse else LOW_SCALE
+        if remaining is None:
+            return FULL
+        for level in range(last + 1):
+            if costs[level] <= remaining:
+                return level
+        return last
 
-    t1=0
-    t2=0
-    R=0
-    C=0
-    L=0
+    def detect(self, image, frame_counter, captured_at=None, fallback=False):
+        """Runs gaze detection on a frame and returns a GazeResult.
 
-    # attention_percent = ((len(all_faces) - total_del)*100)/(len(all_faces)+0.1)
-    print('Pupils?' + str(gaze.pupils_located))
-    text = 'Could not detect pupils.'
+        captured_at is the time.monotonic() stamp taken when the frame was
+        captured; it is carried to the result (and the trace) so latencies
+        can be measured from capture. It defaults to the start of detection.
 
-    if(gaze.pupils_located):
-        text = f'{gaze.eye_left.center[0]}, {gaze.eye_left.center[1]} : {gaze.eye_left.pupil.x}, {gaze.eye_left.pupil.y}'
-        pupil_left = [gaze.eye_left.pupil.x, gaze.eye_left.pupil.y]
-        pupil_right = [gaze.eye_right.pupil.x, gaze.eye_right.pupil.y]
-        metric_left = distance.euclidean(gaze.eye_left.center, pupil_left) / (((gaze.eye_left.center[0] ** 2)+(gaze.eye_left.center[0] ** 2)) ** 0.5)
-        metric_right = distance.euclidean(gaze.eye_right.center, pupil_right) / (((gaze.eye_right.center[0] ** 2)+(gaze.eye_right.center[0] ** 2)) ** 0.5)
-        metric = (metric_left + metric_right) / 2
-        if metric < threshold:
-            attention_percent = 1.0 - metric
+        In multi-face mode the dlib detector output is also used to count faces,
+        so the separate Haar cascade pass is skipped, and the attention of every
+        onlooker is reported alongside the primary user's. When a TraceWriter is
+        set, the landmarks and pupils of the frame are recorded to it for
+        offline re-scoring.
+
+        With the presence pre-filter, a frame showing the empty desk returns
+        a "no user" result (no attention, present=False) right away, and a
+        full analysis finding no face (dlib nor Haar) reports present=False.
+
+        fallback is set when track() hands a frame over: such frames are not
+        traced, so the trace keeps the stride of the scheduled detections.
+        """
+        if not fallback:
+            self._untrackable = False
+        threshold = 0.16
+        if captured_at is None:
+            captured_at = time.monotonic()
+        cpu_start = time.thread_time()
+        deadline = captured_at + self.budget if self.budget is not None else None
+
+        def overrun():
+            return deadline is not None and time.monotonic() > deadline
+
+        level = self._plan(deadline - time.monotonic() if deadline is not None else None)
+
+        gaze = self.gaze
+        print("Gaze Tracking")
+
+        if self.presence is not None and self.presence.is_empty(image, captured_at):
+            print("NO USER")
+            gaze.clear(image)
+            self._reused = 0
+            if self.trace is not None and not fallback:
+                self.trace.append(frame_counter, captured_at, gaze, False, time.thread_time() - cpu_start)
+            return GazeResult(0.0, False, [], None, captured_at, FULL, False)
+
+        validated = True
+        if level == REUSED_LANDMARKS:
+            # The user may have left: check that the previous eye regions still
+            # hold open eyes, as the fast tier does, before trusting their pupils
+            change = gaze.track(image)
+            validated = change is not None and change <= self.max_change and not gaze.eyes_closed()
+            self._reused += 1
+        else:
+            scale = self.low_scale if level == LOW_SCALE else 1.0
+            gaze.refresh(image, detection_scale=scale)
+            self._reused = 0
+            self._update_timing('detect', gaze.timings['detect'] / scale ** 2)
+            self._update_timing('landmarks', gaze.timings['landmarks'])
+        self._update_timing('eyes', gaze.timings['eyes'])
+        # Only the pre-filter looks for someone besides the analyzed faces
+        present = True
+        if self.presence is not None:
+            present = self._someone_present(image, frame_counter)
+            self.presence.update(present, captured_at)
+        text=""
+
+        # attention_percent = ((len(all_faces) - total_del)*100)/(len(all_faces)+0.1)
+        print('Pupils?' + str(gaze.pupils_located))
+        text = 'Could not detect pupils.'
+
+        if(gaze.pupils_located):
+            text = f'{gaze.eye_left.center[0]}, {gaze.eye_left.center[1]} : {gaze.eye_left.pupil.x}, {gaze.eye_left.pupil.y}'
+
+        # Attention of every face in one vectorized pass, primary user first
+        attention = face_attention(gaze.faces, threshold)
+        attention_percent = attention[0] if attention else 0.0
+        onlooker_attention = attention[1:]
+        if not validated:
+            print("REUSED EYE REGIONS CHANGED: attention unknown")
+            attention_percent, onlooker_attention = None, []
+
+        if self.save_frames:
+            if level < NO_ANNOTATION and not overrun():
+                start = time.perf_counter()
+                self._save_annotated_frame(gaze, frame_counter, attention_percent, text, onlooker_attention)
+                self._update_timing('annotate', time.perf_counter() - start)
+            else:
+                level = max(level, NO_ANNOTATION)
+                self._skip_timing('annotate')
+
+        print(f"GAZE ATTENTION: {attention_percent}")
+        # Determine whether a single face is present for this frame
+        one_face = False
+        if self.multi_face:
+            # Faces were already counted by the dlib detector above
+            one_face = len(gaze.faces) == 1
+        elif level >= NO_FACE_COUNT or overrun():
+            # No time for the Haar pass: fall back on the dlib face count
+            level = max(level, NO_FACE_COUNT)
+            one_face = gaze.nb_faces == 1
+            self._skip_timing('count')
         else:
-            attention_percent = max(0.6 - metric, 0.0)
-    else:
-        attention_percent = 0.0
-
-    attention_percent = attention_percent * 100
-
-    formatted_time = time.strftime('%b%d-%H-%M', time.localtime(time.time()))
-    image_file = os.path.join(FRAMES_PATH, f'frame_{formatted_time}_{frame_counter}.png')
-    annotated_frame = cv2.putText(gaze.annotated_frame(), f'Attention: {str(attention_percent)}', (10,15), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255,0,0), 1)
-    annotated_frame = cv2.putText(annotated_frame, f'{text}', (10,50), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255,0,0), 1)
-    # annotated_frame = cv2.putText(annotated_frame, f'{metric_left}, {metric_right}', (10,120), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255,0,0), 1)
-    # Write annotated frame to disk asynchronously to avoid blocking gaze detection
-    try:
-        def _write_image(img, path):
             try:
-                cv2.imwrite(path, img)
+                start = time.perf_counter()
+                one_face = is_there_one_face(image, self.profile, self.models)
+                self._update_timing('count', time.perf_counter() - start)
             except Exception:
-                logging.exception("Failed to write annotated frame to %s", path)
-
-        # submit to executor; returns a Future we intentionally ignore
-        _executor.submit(_write_image, annotated_frame.copy(), image_file)
-    except Exception:
-        # fallback to synchronous write on failure
-        logging.exception("Async write failed, falling back to synchronous write")
-        cv2.imwrite(image_file, annotated_frame)
-
-    print(f"GAZE ATTENTION: {attention_percent}")
-    # Determine whether multiple faces are present for this frame (if function available)
-    one_face = False
-    try:
-        # are_there_multiple_faces is defined in this module
-        one_face = is_there_one_face(image)
-    except Exception:
-        # If face cascade or detection is not available, default to False and log
-        logging.exception("Failed to determine face count for frame %s", frame_counter)
-
-    # Return both attention percentage and multiple-face flag
-    return attention_percent, one_face
\ No newline at end of file
+                # If face cascade or detection is not available, default to False and log
+                logging.exception("Failed to determine face count for frame %s", frame_counter)
+
+        if onlooker_attention:
+            print(f"ONLOOKER ATTENTION: {onlooker_attention}")
+        if level != FULL:
+            print(f"DEGRADED: {DEGRADATION_LEVELS[level]}")
+
+        blink_ratio = gaze.primary_face.blinking_ratio if gaze.primary_face is not None else None
+
+        # Unvalidated frames are left out of the trace, which re-scoring treats as unknown too
+        if self.trace is not None and validated and not fallback:
+            self.trace.append(frame_counter, captured_at, gaze, one_face, time.thread_time() - cpu_start)
+
+        self._one_face = one_face
+        # Return attention percentage, single-face flag, onlooker attention, blinking ratio, capture stamp
+        # and degradation level
+        return GazeResult(attention_percent, one_face, onlooker_attention, blink_ratio, captured_at, level, present)
+
+    def _someone_present(self, image, frame_counter):
+        """Returns true if the last analysis or, when dlib found no face, the
+        Haar cascade sees someone, so the presence pre-filter never learns a
+        user dlib misses (turned away, looking down) as the empty desk."""
+        if self.gaze.faces:
+            return True
+        try:
+            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+            return len(_detect_faces(gray, self.profile, self.models)) > 0
+        except Exception:
+            logging.exception("Failed to look for faces on frame %s", frame_counter)
+            return True
+
+    def track(self, image, frame_counter, captured_at=None):
+        """Runs the fast tier on a frame between two detect() calls and returns
+        a GazeResult, or None when there is no fast tier to run (no face or an
+        incomplete calibration at the last detection, or no pupils found by the
+        last fallback).
+
+        The fast tier only re-locates the pupils in the eye regions of the last
+        detection with the calibrated thresholds. When the eyes are closed the
+        attention is unknown (None); when the pupils are lost or the eye regions
+        changed by more than max_change, the frame gets a full detect() instead.
+        When that detection finds no pupils either, the fast tier stops until
+        the next scheduled detection rather than running a full detection on
+        every frame. The face count comes from the last detection, and fast
+        tier frames are neither annotated nor traced.
+        """
+        if captured_at is None:
+            captured_at = time.monotonic()
+        gaze = self.gaze
+        if self._untrackable or not gaze.trackable:
+            return None
+
+        change = gaze.track(image)
+        if gaze.eyes_closed():
+            return GazeResult(None, self._one_face, [], None, captured_at, fast=True)
+        if change is None or change > self.max_change:
+            print(f"FAST TIER LOST (change {change}): full detection")
+            result = self.detect(image, frame_counter, captured_at, fallback=True)
+            self._untrackable = not gaze.pupils_located
+            return result
+
+        attention = face_attention(gaze.faces)
+        return GazeResult(attention[0], self._one_face, attention[1:], None, captured_at, fast=True)
+
+    def _save_annotated_frame(self, gaze, frame_counter, attention_percent, text, onlooker_attention):
+        formatted_time = time.strftime('%b%d-%H-%M', time.localtime(time.time()))
+        image_file = os.path.join(FRAMES_PATH, f'frame_{formatted_time}_{frame_counter}.png')
+        annotated_frame = cv2.putText(gaze.annotated_frame(), f'Attention: {str(attention_percent)}', (10,15), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255,0,0), 1)
+        annotated_frame = cv2.putText(annotated_frame, f'{text}', (10,50), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255,0,0), 1)
+        if self.multi_face:
+            annotated_frame = cv2.putText(annotated_frame, f'Onlookers: {len(onlooker_attention)}', (10,85), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0,0,255), 1)
+        # annotated_frame = cv2.putText(annotated_frame, f'{metric_left}, {metric_right}', (10,120), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255,0,0), 1)
+        # Write annotated frame to disk asynchronously to avoid blocking gaze detection
+        try:
+            def _write_image(img, path):
+                try:
+                    cv2.imwrite(path, img)
+                except Exception:
+                    logging.exception("Failed to write annotated frame to %s", path)
+
+            # submit to executor; returns a Future we intentionally ignore
+            _executor.submit(_write_image, annotated_frame.copy(), image_file)
+        except Exception:
+            # fallback to synchronous write on failure
+            logging.exception("Async write failed, falling back to synchronous write")
+            cv2.imwrite(image_file, annotated_frame)
+
+
+def getGazeAttention(image, frame_counter, multi_face=False, profile=None, trace=None, captured_at=None):
+    """Runs gaze detection on a frame and returns a GazeResult.
+
+    Each call starts from a fresh calibration and runs the full pipeline with
+    no deadline; use a GazeDetector to keep state per stream and degrade under
+    load. The models are loaded once per process either way. The profile
+    (a name or a Profile) sets the pupil filter, calibration and cascade parameters.
+    """
+    detector = GazeDetector(multi_face=multi_face, profile=profile, trace=trace, budget=float('inf'))
+    return detector.detect(image, frame_counter, captured_at)
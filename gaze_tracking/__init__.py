@@ -1 +1,6 @@
 from .gaze_tracking import GazeTracking
+from .profile import Profile, PROFILES, get_profile
+from .trace import Trace, TraceWriter
+from .models import Models, load_models
+from .parallel import eye_executor
+from .presence import PresenceDetector
@@ -1,6 +1,7 @@
 from __future__ import division
 import cv2
 from .pupil import Pupil
+from .profile import get_profile
 
 
 class Calibration(object):
@@ -9,8 +10,9 @@ class Calibration(object):
     best binarization threshold value for the person and the webcam.
     """
 
-    def __init__(self):
-        self.nb_frames = 20
+    def __init__(self, profile=None):
+        self.profile = get_profile(profile)
+        self.nb_frames = self.profile.calibration_frames
         self.thresholds_left = []
         self.thresholds_right = []
 
@@ -44,18 +46,20 @@ class Calibration(object):
         return nb_blacks / nb_pixels
 
     @staticmethod
-    def find_best_threshold(eye_frame):
+    def find_best_threshold(eye_frame, profile=None):
         """Calculates the optimal threshold to binarize the
         frame for the given eye.
 
-        Argument:
+        Arguments:
             eye_frame (numpy.ndarray): Frame of the eye to be analyzed
+            profile (profile.Profile): Sweep and filter settings, the default profile if None
         """
+        profile = get_profile(profile)
         average_iris_size = 0.48
         trials = {}
 
-        for threshold in range(5, 100, 5):
-            iris_frame = Pupil.image_processing(eye_frame, threshold)
+        for threshold in range(5, 100, profile.threshold_step):
+            iris_frame = Pupil.image_processing(eye_frame, threshold, profile)
             trials[threshold] = Calibration.iris_size(iris_frame)
 
         best_threshold, iris_size = min(trials.items(), key=(lambda p: abs(p[1] - average_iris_size)))
@@ -69,7 +73,7 @@ class Calibration(object):
             eye_frame (numpy.ndarray): Frame of the eye
             side: Indicates whether it's the left eye (0) or the right eye (1)
         """
-        threshold = self.find_best_threshold(eye_frame)
+        threshold = self.find_best_threshold(eye_frame, self.profile)
 
         if side == 0:
             self.thresholds_left.append(threshold)
@@ -0,0 +1,90 @@
+from __future__ import division
+import numpy as np
+from .eye import Eye
+from .landmarks import eye_geometry, gaze_ratios
+
+
+class Face(object):
+    """
+    This class holds the analysis of a single detected face: its
+    bounding box, its (68, 2) landmarks array and both Eye objects.
+    """
+
+    def __init__(self, frame, rect, landmarks, calibration, calibrate=True, eyes=None, geometry=None):
+        """
+        Arguments:
+            eyes (tuple): (left, right) Eye objects already analyzed, e.g. on
+                another thread; they are analyzed here if None
+            geometry (tuple): This face's rows of landmarks.eye_geometry, computed
+                from the landmarks if None
+        """
+        self.rect = rect
+        self.landmarks = landmarks
+        if eyes is None:
+            regions, boxes, blinking = geometry if geometry is not None else eye_geometry(landmarks)
+            eyes = tuple(Eye(frame, regions[side], boxes[side], blinking[side], side, calibration, calibrate)
+                         for side in (0, 1))
+        self.eye_left, self.eye_right = eyes
+
+    @property
+    def area(self):
+        """Returns the area of the face bounding box in pixels"""
+        return self.rect.width() * self.rect.height()
+
+    @property
+    def pupils_located(self):
+        """Check that the pupils have been located"""
+        try:
+            int(self.eye_left.pupil.x)
+            int(self.eye_left.pupil.y)
+            int(self.eye_right.pupil.x)
+            int(self.eye_right.pupil.y)
+            return True
+        except Exception:
+            return False
+
+    @property
+    def pupils(self):
+        """Returns the pupil positions in their eye frames as a (2, 2) array, left eye first"""
+        if self.pupils_located:
+            return np.array([(self.eye_left.pupil.x, self.eye_left.pupil.y),
+                             (self.eye_right.pupil.x, self.eye_right.pupil.y)], dtype=np.float64)
+
+    @property
+    def centers(self):
+        """Returns the centers of the eye frames as a (2, 2) array, left eye first"""
+        return np.array([self.eye_left.center, self.eye_right.center], dtype=np.float64)
+
+    def gaze_ratio(self):
+        """Returns the (horizontal, vertical) gaze ratios of this face"""
+        if self.pupils_located:
+            return tuple(gaze_ratios(self.pupils, self.centers))
+
+    def horizontal_ratio(self):
+        """Returns a number between 0.0 and 1.0 that indicates the
+        horizontal direction of the gaze for this face
+        """
+        if self.pupils_located:
+            return self.gaze_ratio()[0]
+
+    def vertical_ratio(self):
+        """Returns a number between 0.0 and 1.0 that indicates the
+        vertical direction of the gaze for this face
+        """
+        if self.pupils_located:
+            return self.gaze_ratio()[1]
+
+    @property
+    def blinking_ratio(self):
+        """Returns the width / height ratio averaged over both eyes, None if unknown"""
+        if self.eye_left.blinking is not None and self.eye_right.blinking is not None:
+            return (self.eye_left.blinking + self.eye_right.blinking) / 2
+
+    def is_blinking(self, threshold=3.8):
+        """Returns true if this face has its eyes closed
+
+        Argument:
+            threshold (float): Blinking ratio above which the eyes are considered closed
+        """
+        if self.pupils_located:
+            return self.blinking_ratio > threshold
@@ -1,9 +1,14 @@
 from __future__ import division
-import os
+import time
+import numpy as np
 import cv2
 import dlib
+from .face import Face
 from .eye import Eye
+from .landmarks import shape_to_array, eye_geometry
 from .calibration import Calibration
+from .profile import get_profile
+from .models import load_models
 
 
 class GazeTracking(object):
@@ -13,19 +18,27 @@ class GazeTracking(object):
     and pupils and allows to know if the eyes are open or closed
     """
 
-    def __init__(self):
+    def __init__(self, multi_face=False, profile=None, models=None, executor=None):
         self.frame = None
         self.eye_left = None
         self.eye_right = None
-        self.calibration = Calibration()
+        self.faces = []
+        self.nb_faces = 0
+        self.multi_face = multi_face
+        self.profile = get_profile(profile)
+        # seconds spent in each stage of the last analysis
+        self.timings = {'detect': 0.0, 'landmarks': 0.0, 'eyes': 0.0}
+        self.calibration = Calibration(self.profile)
 
-        # _face_detector is used to detect faces
-        self._face_detector = dlib.get_frontal_face_detector()
-
-        # _predictor is used to get facial landmarks of a given face
-        cwd = os.path.abspath(os.path.dirname(__file__))
-        model_path = os.path.abspath(os.path.join(cwd, "trained_models/shape_predictor_68_face_landmarks.dat"))
-        self._predictor = dlib.shape_predictor(model_path)
+        # _models holds the face detector and the landmark predictor,
+        # loaded once per process and shared between trackers
+        self._models = models if models is not None else load_models()
+        # _executor analyzes the eyes of a frame concurrently (see parallel.eye_executor),
+        # None to analyze them one after the other
+        self._executor = executor
+        # primary eyes and their dark (iris) share at the last analysis
+        # with fresh landmarks, the reference of the fast tier (see track)
+        self._reference = None
 
     @property
     def pupils_located(self):
@@ -39,28 +52,200 @@ class GazeTracking(object):
         except Exception:
             return False
 
-    def _analyze(self):
-        """Detects the face and initialize Eye objects"""
+    @property
+    def primary_face(self):
+        """Returns the Face of the primary user, or None if no face was found"""
+        if self.faces:
+            return self.faces[0]
+
+    @property
+    def onlookers(self):
+        """Returns the Faces detected besides the primary user"""
+        return self.faces[1:]
+
+    @property
+    def landmarks(self):
+        """Returns the (68, 2) landmarks array of the primary user, or None"""
+        if self.faces:
+            return self.faces[0].landmarks
+
+    def landmarks_array(self):
+        """Returns the landmarks of every analyzed face as a (N, 68, 2) array,
+        primary user first
+        """
+        if not self.faces:
+            return np.empty((0, 68, 2), dtype=np.int32)
+        return np.stack([face.landmarks for face in self.faces])
+
+    def _detect_faces(self, frame, detection_scale):
+        """Returns the face rectangles of the frame, detected on a copy
+        downscaled by detection_scale to save time"""
+        if detection_scale == 1.0:
+            return list(self._models.face_detector(frame))
+
+        small = cv2.resize(frame, None, fx=detection_scale, fy=detection_scale, interpolation=cv2.INTER_AREA)
+        return [dlib.rectangle(int(r.left() / detection_scale), int(r.top() / detection_scale),
+                               int(r.right() / detection_scale), int(r.bottom() / detection_scale))
+                for r in self._models.face_detector(small)]
+
+    def _analyze(self, detection_scale=1.0, reuse_landmarks=False):
+        """Detects the faces and initialize Face and Eye objects.
+
+        The face detector runs once per frame. In multi-face mode landmarks
+        are computed for every detected face and the largest one is taken
+        as the primary user, the others being onlookers. Only the primary
+        user feeds the calibration. Each dlib shape is converted once to a
+        (68, 2) array, which is what the Face and Eye geometry works on.
+
+        With reuse_landmarks, detection and landmarks are skipped and the eyes
+        are analyzed again at the landmarks of the previous frame.
+        """
         frame = cv2.cvtColor(self.frame, cv2.COLOR_BGR2GRAY)
-        faces = self._face_detector(frame)
+        start = time.perf_counter()
 
-        try:
-            landmarks = self._predictor(frame, faces[0])
-            self.eye_left = Eye(frame, landmarks, 0, self.calibration)
-            self.eye_right = Eye(frame, landmarks, 1, self.calibration)
+        reuse_landmarks = reuse_landmarks and bool(self.faces)
+        if reuse_landmarks:
+            detections = [(face.rect, face.landmarks) for face in self.faces]
+            detected = landmarked = start
+        else:
+            rects = self._detect_faces(frame, detection_scale)
+            self.nb_faces = len(rects)
+
+            if self.multi_face:
+                rects.sort(key=lambda rect: rect.width() * rect.height(), reverse=True)
+            else:
+                rects = rects[:1]
+            detected = time.perf_counter()
+
+            detections = [(rect, shape_to_array(self._models.predictor(frame, rect))) for rect in rects]
+            landmarked = time.perf_counter()
+
+        # Eye contours, crop boxes and blinking ratios of every face in one vectorized pass
+        geometry = []
+        if detections:
+            regions, boxes, blinking = eye_geometry(np.stack([landmarks for rect, landmarks in detections]))
+            geometry = list(zip(regions, boxes, blinking))
+
+        if self._executor is not None:
+            eyes = self._analyze_eyes(frame, geometry)
+        else:
+            eyes = [None] * len(detections)
+        self.faces = []
+        for i, (rect, landmarks) in enumerate(detections):
+            self.faces.append(Face(frame, rect, landmarks, self.calibration, calibrate=(i == 0), eyes=eyes[i],
+                                   geometry=geometry[i]))
+
+        self.timings = {
+            'detect': detected - start,
+            'landmarks': landmarked - detected,
+            'eyes': time.perf_counter() - landmarked,
+        }
 
-        except IndexError:
+        if self.faces:
+            self.eye_left = self.faces[0].eye_left
+            self.eye_right = self.faces[0].eye_right
+        else:
             self.eye_left = None
             self.eye_right = None
 
-    def refresh(self, frame):
+        if not reuse_landmarks:
+            self._reference = self._eye_state() if self.faces else None
+
+    def _eye_state(self):
+        """Returns each primary Eye with its share of dark (iris) pixels"""
+        state = []
+        for eye in (self.eye_left, self.eye_right):
+            iris_frame = eye.pupil.iris_frame
+            state.append((eye, 1 - cv2.countNonZero(iris_frame) / iris_frame.size if iris_frame.size else 0.0))
+        return state
+
+    def _analyze_eyes(self, frame, geometry):
+        """Analyzes both eyes of every face concurrently on the executor, from
+        their rows of landmarks.eye_geometry, and returns their (left, right)
+        Eye pairs.
+
+        Onlookers use the thresholds the primary user adds during the
+        calibration, so until it is complete they wait for the primary eyes.
+        """
+        def analyze(batch, calibrate):
+            futures = [[self._executor.submit(Eye, frame, regions[side], boxes[side], blinking[side], side,
+                                              self.calibration, calibrate and j == 0)
+                        for side in (0, 1)] for j, (regions, boxes, blinking) in enumerate(batch)]
+            return [tuple(future.result() for future in pair) for pair in futures]
+
+        if self.calibration.is_complete():
+            return analyze(geometry, True)
+        return analyze(geometry[:1], True) + analyze(geometry[1:], False)
+
+    def refresh(self, frame, detection_scale=1.0, reuse_landmarks=False):
         """Refreshes the frame and analyzes it.
 
         Arguments:
             frame (numpy.ndarray): The frame to analyze
+            detection_scale (float): Scale of the frame the face detector runs on
+            reuse_landmarks (bool): Reuse the landmarks of the previous frame instead
+                of detecting faces again
         """
         self.frame = frame
-        self._analyze()
+        self._analyze(detection_scale, reuse_landmarks)
+
+    @property
+    def trackable(self):
+        """Check that the fast tier can run: a face was found by the last full
+        analysis and the calibration is complete"""
+        return self._reference is not None and bool(self.faces) and self.calibration.is_complete()
+
+    def track(self, frame):
+        """Fast tier between full analyses: re-locates the pupils of every face
+        in the eye regions of the last full analysis with the calibrated
+        thresholds, without detecting faces or landmarks.
+
+        Returns the mean absolute change (between 0.0 and 1.0) of the primary
+        eye regions since the last full analysis, or None if the pupils were
+        not located; a large change means the eyes moved out of their regions.
+
+        Argument:
+            frame (numpy.ndarray): The frame to analyze
+        """
+        self.frame = frame
+        self._analyze(reuse_landmarks=True)
+        if not self.pupils_located:
+            return None
+
+        change = 0.0
+        for (reference, _), (eye, _) in zip(self._reference, self._eye_state()):
+            if reference.frame.shape == eye.frame.shape and cv2.countNonZero(eye.mask):
+                # Only the pixels inside the eye count, the rest of the crop is masked out
+                change = max(change, cv2.mean(cv2.absdiff(reference.frame, eye.frame), mask=eye.mask)[0] / 255)
+            else:
+                change = 1.0
+        return change
+
+    def eyes_closed(self, ratio=0.5):
+        """Returns true if the dark (iris) share of both primary eyes fell below
+        ratio times its value at the last full analysis, as when blinking
+
+        Argument:
+            ratio (float): Share of the reference iris size below which an eye is closed
+        """
+        if self._reference is None or not self.faces:
+            return False
+        return all(dark < ratio * reference_dark
+                   for (_, reference_dark), (_, dark) in zip(self._reference, self._eye_state()))
+
+    def clear(self, frame):
+        """Sets the frame without analyzing it, as a frame where no face was found
+
+        Argument:
+            frame (numpy.ndarray): The frame
+        """
+        self.frame = frame
+        self.faces = []
+        self.nb_faces = 0
+        self.eye_left = None
+        self.eye_right = None
+        self._reference = None
+        self.timings = {'detect': 0.0, 'landmarks': 0.0, 'eyes': 0.0}
 
     def pupil_left_coords(self):
         """Returns the coordinates of the left pupil"""
@@ -82,9 +267,7 @@ class GazeTracking(object):
         the center is 0.5 and the extreme left is 1.0
         """
         if self.pupils_located:
-            pupil_left = self.eye_left.pupil.x / (self.eye_left.center[0] * 2 - 10)
-            pupil_right = self.eye_right.pupil.x / (self.eye_right.center[0] * 2 - 10)
-            return (pupil_left + pupil_right) / 2
+            return self.primary_face.horizontal_ratio()
 
     def vertical_ratio(self):
         """Returns a number between 0.0 and 1.0 that indicates the
@@ -92,9 +275,7 @@ class GazeTracking(object):
         the center is 0.5 and the extreme bottom is 1.0
         """
         if self.pupils_located:
-            pupil_left = self.eye_left.pupil.y / (self.eye_left.center[1] * 2 - 10)
-            pupil_right = self.eye_right.pupil.y / (self.eye_right.center[1] * 2 - 10)
-            return (pupil_left + pupil_right) / 2
+            return self.primary_face.vertical_ratio()
 
     def is_right(self):
         """Returns true if the user is looking to the right"""
@@ -111,15 +292,24 @@ class GazeTracking(object):
         if self.pupils_located:
             return self.is_right() is not True and self.is_left() is not True
 
-    def is_blinking(self):
-        """Returns true if the user closes his eyes"""
+    def is_blinking(self, threshold=3.8):
+        """Returns true if the user closes his eyes
+
+        Argument:
+            threshold (float): Blinking ratio above which the eyes are considered closed
+        """
         if self.pupils_located:
             blinking_ratio = (self.eye_left.blinking + self.eye_right.blinking) / 2
-            return blinking_ratio > 3.8
+            return blinking_ratio > threshold
+
+    def annotated_frame(self, frame=None):
+        """Returns the main frame with pupils highlighted
 
-    def annotated_frame(self):
-        """Returns the main frame with pupils highlighted"""
-        frame = self.frame.copy()
+        Arguments:
+            frame (numpy.ndarray): Frame of the same size to draw the last analysis on
+                instead of the main frame, e.g. a more recent camera frame
+        """
+        frame = (self.frame if frame is None else frame).copy()
 
         if self.pupils_located:
             color = (0, 255, 0)
@@ -130,4 +320,16 @@ class GazeTracking(object):
             cv2.line(frame, (x_right - 5, y_right), (x_right + 5, y_right), color)
             cv2.line(frame, (x_right, y_right - 5), (x_right, y_right + 5), color)
 
+        if self.multi_face:
+            for i, face in enumerate(self.faces):
+                color = (0, 255, 0) if i == 0 else (0, 0, 255)
+                rect = face.rect
+                cv2.rectangle(frame, (rect.left(), rect.top()), (rect.right(), rect.bottom()), color)
+                if i > 0 and face.pupils_located:
+                    for eye in (face.eye_left, face.eye_right):
+                        x = eye.origin[0] + eye.pupil.x
+                        y = eye.origin[1] + eye.pupil.y
+                        cv2.line(frame, (x - 5, y), (x + 5, y), color)
+                        cv2.line(frame, (x, y - 5), (x, y + 5), color)
+
         return frame
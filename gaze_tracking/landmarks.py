@@ -0,0 +1,85 @@
+from __future__ import division
+import numpy as np
+
+# Indices of the eye contours in the 68 Multi-PIE landmarks, left eye first
+EYE_POINTS = np.array([[36, 37, 38, 39, 40, 41], [42, 43, 44, 45, 46, 47]])
+
+
+def shape_to_array(shape):
+    """Converts a dlib shape to a (68, 2) array of (x, y) coordinates.
+
+    This is the only place where the landmarks cross from dlib to Python,
+    all the geometry below works on the returned array.
+
+    Argument:
+        shape (dlib.full_object_detection): Facial landmarks for the face region
+    """
+    return np.array([(point.x, point.y) for point in shape.parts()], dtype=np.int32)
+
+
+def eye_regions(landmarks):
+    """Returns the eye contours as a (..., 2, 6, 2) array, left eye first.
+
+    Argument:
+        landmarks (numpy.ndarray): (68, 2) landmarks, or (N, 68, 2) for N faces
+    """
+    return landmarks[..., EYE_POINTS, :]
+
+
+def eye_boxes(landmarks, margin=5):
+    """Returns the crop box (min_x, min_y, max_x, max_y) of each eye
+    as a (..., 2, 4) array.
+
+    Arguments:
+        landmarks (numpy.ndarray): (68, 2) landmarks, or (N, 68, 2) for N faces
+        margin (int): Pixels added around the eye contour
+    """
+    regions = eye_regions(landmarks)
+    mins = regions.min(axis=-2) - margin
+    maxs = regions.max(axis=-2) + margin
+    return np.concatenate([mins, maxs], axis=-1)
+
+
+def blinking_ratios(landmarks):
+    """Returns the width / height ratio of each eye as a (..., 2) array.
+    A high value indicates a closed eye, NaN means the eye has no height.
+
+    Argument:
+        landmarks (numpy.ndarray): (68, 2) landmarks, or (N, 68, 2) for N faces
+    """
+    regions = eye_regions(landmarks)
+    left = regions[..., 0, :]
+    right = regions[..., 3, :]
+    top = np.trunc((regions[..., 1, :] + regions[..., 2, :]) / 2)
+    bottom = np.trunc((regions[..., 5, :] + regions[..., 4, :]) / 2)
+
+    eye_width = np.hypot(*np.moveaxis(left - right, -1, 0))
+    eye_height = np.hypot(*np.moveaxis(top - bottom, -1, 0))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratios = eye_width / eye_height
+    ratios[eye_height == 0] = np.nan
+    return ratios
+
+
+def eye_geometry(landmarks, margin=5):
+    """Returns the contours, crop boxes and blinking ratios of the eyes,
+    computed in one vectorized pass, as (..., 2, 6, 2), (..., 2, 4) and
+    (..., 2) arrays, left eye first.
+
+    Arguments:
+        landmarks (numpy.ndarray): (68, 2) landmarks, or (N, 68, 2) for N faces
+        margin (int): Pixels added around the eye contour in the crop boxes
+    """
+    return eye_regions(landmarks), eye_boxes(landmarks, margin), blinking_ratios(landmarks)
+
+
+def gaze_ratios(pupils, centers):
+    """Returns the (horizontal, vertical) gaze ratios as a (..., 2) array.
+    0.0 is the extreme right/top, 0.5 the center and 1.0 the extreme left/bottom.
+
+    Arguments:
+        pupils (numpy.ndarray): (..., 2, 2) pupil positions in their eye frames
+        centers (numpy.ndarray): (..., 2, 2) centers of the eye frames
+    """
+    return (pupils / (centers * 2 - 10)).mean(axis=-2)
@@ -0,0 +1,53 @@
+import os
+import threading
+import cv2
+import dlib
+
+_lock = threading.Lock()
+_models = None
+
+
+class Models(object):
+    """
+    This class holds the models of the pipeline so they are loaded once
+    per process and shared by every GazeTracking instance.
+
+    The landmark predictor (the large model) is shared by all threads. The
+    face detector and the Haar cascade are cheap to build but not safe for
+    concurrent use, so each thread gets its own.
+    """
+
+    def __init__(self, model_path=None):
+        if model_path is None:
+            cwd = os.path.abspath(os.path.dirname(__file__))
+            model_path = os.path.abspath(os.path.join(cwd, "trained_models/shape_predictor_68_face_landmarks.dat"))
+
+        # predictor is used to get facial landmarks of a given face
+        self.predictor = dlib.shape_predictor(model_path)
+        self._local = threading.local()
+
+    @property
+    def face_detector(self):
+        """Returns the dlib face detector of the calling thread"""
+        detector = getattr(self._local, 'face_detector', None)
+        if detector is None:
+            detector = self._local.face_detector = dlib.get_frontal_face_detector()
+        return detector
+
+    @property
+    def face_cascade(self):
+        """Returns the Haar face cascade of the calling thread"""
+        cascade = getattr(self._local, 'face_cascade', None)
+        if cascade is None:
+            cascade = self._local.face_cascade = cv2.CascadeClassifier(
+                cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+        return cascade
+
+
+def load_models():
+    """Returns the process-wide Models, loading them on first use"""
+    global _models
+    with _lock:
+        if _models is None:
+            _models = Models()
+        return _models
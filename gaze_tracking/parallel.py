@@ -0,0 +1,28 @@
+import concurrent.futures
+import os
+import threading
+import cv2
+
+_lock = threading.Lock()
+_executors = {}
+
+
+def eye_executor(workers=2):
+    """Returns the process-wide thread pool analyzing eyes within a frame,
+    creating it on first use.
+
+    Eye isolation, the calibration sweep and pupil detection are OpenCV
+    calls that release the GIL, so both eyes (and every face) of a frame
+    can be analyzed concurrently. OpenCV's own thread pool is shrunk so
+    that workers x OpenCV threads does not exceed the number of cores.
+
+    Argument:
+        workers (int): Number of eye analysis threads
+    """
+    with _lock:
+        executor = _executors.get(workers)
+        if executor is None:
+            executor = _executors[workers] = concurrent.futures.ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix='eyes')
+            cv2.setNumThreads(max(1, (os.cpu_count() or 1) // max(_executors)))
+        return executor
@@ -0,0 +1,128 @@
+from __future__ import division
+import time
+import cv2
+
+
+class PresenceDetector(object):
+    """
+    This class is a cheap pre-filter telling whether the scene still looks
+    like the empty desk, so the dlib pipeline can be skipped while nobody
+    is there.
+
+    It keeps a MOG2 background model of a tiny grayscale copy of the frame
+    that only learns from frames known to be empty: full analyses that found
+    no face (dlib nor Haar) after the desk stayed faceless for a while and,
+    once the model is trained, that already match it; and frames the
+    pre-filter itself found empty. When the empty scene itself changes (the
+    light goes on, the chair is moved) and nobody is found for a while, the
+    model starts over from the new scene. A frame is confidently empty when almost
+    none of its pixels differ from that model. Anything that changes the
+    scene (someone sitting down, the light going on) shows up as foreground
+    and resumes the full analysis.
+    """
+
+    def __init__(self, width=64, min_foreground=0.02, warmup=10, recheck_interval=5.0, settle=30.0, history=100,
+                 var_threshold=16):
+        """
+        Arguments:
+            width (int): Width of the frame the background model works on
+            min_foreground (float): Share of changed pixels from which someone may be present
+            warmup (int): Empty frames to learn before the pre-filter may skip anything
+            recheck_interval (float): Seconds after a full analysis during which frames
+                may be skipped, so a user the model mistakes for the desk is still found
+            settle (float): Seconds the full analysis must have found no face before
+                its frames are learned, so a user looking away is not learned
+            history (int): Number of empty frames the background model remembers
+            var_threshold (float): MOG2 distance above which a pixel is foreground
+        """
+        self.width = width
+        self.min_foreground = min_foreground
+        self.warmup = warmup
+        self.recheck_interval = recheck_interval
+        self.settle = settle
+        self.history = history
+        self.var_threshold = var_threshold
+        self.subtractor = None
+        self.foreground = None
+        self._learned = 0
+        self._checked_at = None  # time.monotonic() of the last full analysis
+        self._faceless_since = None  # first full analysis of the current run without a face
+        self._changed_since = None  # first faceless full analysis of the current run not matching the model
+        self._reset_model()
+
+    def _reset_model(self):
+        self.subtractor = cv2.createBackgroundSubtractorMOG2(self.history, self.var_threshold, detectShadows=False)
+        self._learned = 0
+        self._small = None
+
+    def _shrink(self, frame):
+        height, width = frame.shape[:2]
+        size = (self.width, max(1, round(height * self.width / width)))
+        # Subsampling first keeps INTER_AREA (which averages out sensor noise) cheap
+        step = max(1, width // (2 * self.width))
+        small = cv2.resize(frame[::step, ::step], size, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return small
+
+    def _learn(self, small):
+        self.subtractor.apply(small, learningRate=-1)
+        self._learned += 1
+
+    def is_empty(self, frame, now=None):
+        """Returns true if the frame confidently shows the empty scene, in which
+        case it also refines the background model. Otherwise the frame needs a
+        full analysis, whose outcome must be reported with update().
+
+        Arguments:
+            frame (numpy.ndarray): BGR or grayscale frame
+            now (float): time.monotonic() stamp of the frame, the current time if None
+        """
+        now = time.monotonic() if now is None else now
+        self._small = self._shrink(frame)
+        if self._learned < self.warmup:
+            self.foreground = None
+            return False
+
+        mask = self.subtractor.apply(self._small, learningRate=0)
+        self.foreground = cv2.countNonZero(mask) / mask.size
+        recent = self._checked_at is not None and now - self._checked_at < self.recheck_interval
+        if self.foreground < self.min_foreground and recent:
+            self._learn(self._small)
+            return True
+        return False
+
+    def update(self, present, now=None):
+        """Reports whether the full analysis of the last frame given to
+        is_empty() found someone. The frame is learned as background only
+        when no face was found for the last settle seconds and, once the
+        model is trained, the frame already matches it. A faceless scene that
+        has not matched the model for settle seconds replaces it.
+
+        Arguments:
+            present (bool): Whether a face was found, by dlib or by the Haar cascade
+            now (float): time.monotonic() stamp of the frame, the current time if None
+        """
+        now = time.monotonic() if now is None else now
+        self._checked_at = now
+        if present:
+            self._faceless_since = None
+            self._changed_since = None
+            return
+        if self._faceless_since is None:
+            self._faceless_since = now
+        changed = self._learned >= self.warmup and self.foreground is not None and self.foreground >= self.min_foreground
+        if not changed:
+            self._changed_since = None
+        elif self._changed_since is None:
+            self._changed_since = now
+        if self._small is None or now - self._faceless_since < self.settle:
+            return
+        if changed:
+            if now - self._changed_since < self.settle:
+                # Something the face detectors missed may differ from the empty desk
+                return
+            # Nobody showed up since the scene changed: the empty desk looks different now
+            self._reset_model()
+            self._changed_since = None
+        self._learn(self._small)
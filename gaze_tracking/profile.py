@@ -0,0 +1,72 @@
+from collections import namedtuple
+
+# Every speed/accuracy knob of the pipeline, from capture to pupil detection
+Profile = namedtuple('Profile', [
+    'name',
+    'video_width',            # capture/processing resolution
+    'video_height',
+    'gaze_interval',          # run gaze detection every N frames
+    'bilateral_diameter',     # Pupil.image_processing bilateral filter
+    'bilateral_sigma_color',
+    'bilateral_sigma_space',
+    'erode_iterations',       # Pupil.image_processing erosion
+    'calibration_frames',     # frames needed to complete the calibration
+    'threshold_step',         # step of the calibration threshold sweep
+    'cascade_scale_factor',   # Haar detectMultiScale parameters
+    'cascade_min_neighbors',
+    'detection_budget',       # seconds from capture to result before detection degrades, None for no deadline
+])
+
+PROFILES = {
+    'low-power': Profile(
+        name='low-power',
+        video_width=320, video_height=240,
+        gaze_interval=20,
+        bilateral_diameter=5, bilateral_sigma_color=10, bilateral_sigma_space=10,
+        erode_iterations=2,
+        calibration_frames=10,
+        threshold_step=10,
+        cascade_scale_factor=1.4, cascade_min_neighbors=4,
+        detection_budget=0.15,
+    ),
+    'balanced': Profile(
+        name='balanced',
+        video_width=600, video_height=400,
+        gaze_interval=10,
+        bilateral_diameter=10, bilateral_sigma_color=15, bilateral_sigma_space=15,
+        erode_iterations=3,
+        calibration_frames=20,
+        threshold_step=5,
+        cascade_scale_factor=1.3, cascade_min_neighbors=5,
+        detection_budget=0.1,
+    ),
+    'accurate': Profile(
+        name='accurate',
+        video_width=800, video_height=600,
+        gaze_interval=5,
+        bilateral_diameter=10, bilateral_sigma_color=15, bilateral_sigma_space=15,
+        erode_iterations=3,
+        calibration_frames=30,
+        threshold_step=2,
+        cascade_scale_factor=1.1, cascade_min_neighbors=5,
+        detection_budget=0.2,
+    ),
+}
+
+DEFAULT_PROFILE = 'balanced'
+
+
+def get_profile(profile=None):
+    """Returns the Profile for the given name.
+
+    Argument:
+        profile: Name of a profile, a Profile (returned as is) or None for the default one
+    """
+    if profile is None:
+        profile = DEFAULT_PROFILE
+    if isinstance(profile, Profile):
+        return profile
+    try:
+        return PROFILES[profile]
+    except KeyError:
+        raise ValueError(f"Unknown profile {profile!r}, expected one of {sorted(PROFILES)}")
@@ -1,5 +1,6 @@
 import numpy as np
 import cv2
+from .profile import get_profile
 
 
 class Pupil(object):
@@ -8,28 +9,32 @@ class Pupil(object):
     the position of the pupil
     """
 
-    def __init__(self, eye_frame, threshold):
+    def __init__(self, eye_frame, threshold, profile=None):
         self.iris_frame = None
         self.threshold = threshold
+        self.profile = get_profile(profile)
         self.x = None
         self.y = None
 
         self.detect_iris(eye_frame)
 
     @staticmethod
-    def image_processing(eye_frame, threshold):
+    def image_processing(eye_frame, threshold, profile=None):
         """Performs operations on the eye frame to isolate the iris
 
         Arguments:
             eye_frame (numpy.ndarray): Frame containing an eye and nothing else
             threshold (int): Threshold value used to binarize the eye frame
+            profile (profile.Profile): Filter settings, the default profile if None
 
         Returns:
             A frame with a single element representing the iris
         """
+        profile = get_profile(profile)
         kernel = np.ones((3, 3), np.uint8)
-        new_frame = cv2.bilateralFilter(eye_frame, 10, 15, 15)
-        new_frame = cv2.erode(new_frame, kernel, iterations=3)
+        new_frame = cv2.bilateralFilter(eye_frame, profile.bilateral_diameter,
+                                        profile.bilateral_sigma_color, profile.bilateral_sigma_space)
+        new_frame = cv2.erode(new_frame, kernel, iterations=profile.erode_iterations)
         new_frame = cv2.threshold(new_frame, threshold, 255, cv2.THRESH_BINARY)[1]
 
         return new_frame
@@ -41,7 +46,7 @@ class Pupil(object):
         Arguments:
             eye_frame (numpy.ndarray): Frame containing an eye and nothing else
         """
-        self.iris_frame = self.image_processing(eye_frame, self.threshold)
+        self.iris_frame = self.image_processing(eye_frame, self.threshold, self.profile)
 
         contours, _ = cv2.findContours(self.iris_frame, cv2.RETR_TREE, cv2.CHAIN_APPROX_NONE)[-2:]
         contours = sorted(contours, key=cv2.contourArea)
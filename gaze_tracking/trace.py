@@ -0,0 +1,130 @@
+from __future__ import division
+import json
+import os
+import numpy as np
+
+TRACE_VERSION = 2
+
+# Columns with one row per analyzed frame
+FRAME_COLUMNS = {
+    'frame_index': ((), np.int64),
+    'timestamp': ((), np.float64),
+    'face_start': ((), np.int64),   # offset of the frame's first face in the face columns
+    'face_count': ((), np.int32),
+    'one_face': ((), np.bool_),     # face-count flag the lock decision was made with
+    'thresholds': ((2,), np.float32),  # calibration threshold of each eye, NaN before calibration
+    'cpu_time': ((), np.float32),   # CPU seconds spent on the detection, NaN if unknown (added in version 2)
+}
+
+# Columns with one row per detected face, primary user first within each frame
+FACE_COLUMNS = {
+    'boxes': ((4,), np.int32),          # left, top, right, bottom
+    'landmarks': ((68, 2), np.int16),
+    'pupils': ((2, 2), np.float32),     # pupil position in each eye frame, NaN when not located
+    'centers': ((2, 2), np.float32),    # center of each eye frame
+}
+
+
+class TraceWriter(object):
+    """
+    This class records compact per-frame gaze tracking results (face boxes,
+    landmarks, pupil positions and calibration thresholds) so attention and
+    lock decisions can be recomputed later without touching pixels.
+
+    The trace is a directory with one .npy file per column, written on close().
+    """
+
+    def __init__(self, path, profile=None, multi_face=False):
+        self.path = path
+        self.meta = {
+            'version': TRACE_VERSION,
+            'profile': getattr(profile, 'name', profile),
+            'multi_face': multi_face,
+        }
+        self._frames = {name: [] for name in FRAME_COLUMNS}
+        self._faces = {name: [] for name in FACE_COLUMNS}
+        self._nb_faces = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def append(self, frame_index, timestamp, gaze, one_face, cpu_time=np.nan):
+        """Records the result of a GazeTracking refresh.
+
+        Arguments:
+            frame_index (int): Index of the frame in the recording
+            timestamp (float): Time of the frame, in seconds
+            gaze (GazeTracking): Tracker that has just analyzed the frame
+            one_face (bool): Face-count flag used for the lock decision
+            cpu_time (float): CPU seconds spent on the detection
+        """
+        calibration = gaze.calibration
+        thresholds = [np.nan, np.nan]
+        if calibration.thresholds_left:
+            thresholds[0] = calibration.threshold(0)
+        if calibration.thresholds_right:
+            thresholds[1] = calibration.threshold(1)
+
+        self._frames['frame_index'].append(frame_index)
+        self._frames['timestamp'].append(timestamp)
+        self._frames['face_start'].append(self._nb_faces)
+        self._frames['face_count'].append(len(gaze.faces))
+        self._frames['one_face'].append(bool(one_face))
+        self._frames['thresholds'].append(thresholds)
+        self._frames['cpu_time'].append(cpu_time)
+
+        for face in gaze.faces:
+            rect = face.rect
+            pupils = face.pupils
+            self._faces['boxes'].append((rect.left(), rect.top(), rect.right(), rect.bottom()))
+            self._faces['landmarks'].append(face.landmarks)
+            self._faces['pupils'].append(pupils if pupils is not None else np.full((2, 2), np.nan))
+            self._faces['centers'].append(face.centers)
+        self._nb_faces += len(gaze.faces)
+
+    def close(self):
+        """Writes the recorded columns to the trace directory"""
+        os.makedirs(self.path, exist_ok=True)
+        for columns, rows in ((FRAME_COLUMNS, self._frames), (FACE_COLUMNS, self._faces)):
+            for name, (shape, dtype) in columns.items():
+                array = np.asarray(rows[name], dtype=dtype).reshape((-1,) + shape)
+                np.save(os.path.join(self.path, name + '.npy'), array)
+        with open(os.path.join(self.path, 'meta.json'), 'w') as f:
+            json.dump(self.meta, f)
+
+
+class Trace(object):
+    """
+    This class loads a trace recorded by TraceWriter. Columns are
+    memory-mapped by default so large traces load instantly.
+    """
+
+    def __init__(self, path, mmap=True):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as f:
+            self.meta = json.load(f)
+
+        mmap_mode = 'r' if mmap else None
+        for name in list(FRAME_COLUMNS) + list(FACE_COLUMNS):
+            column = os.path.join(path, name + '.npy')
+            if name == 'cpu_time' and not os.path.exists(column):
+                # version 1 traces did not record the CPU time
+                self.cpu_time = np.full(len(self.frame_index), np.nan, dtype=np.float32)
+                continue
+            setattr(self, name, np.load(column, mmap_mode=mmap_mode))
+
+    def __len__(self):
+        return len(self.frame_index)
+
+    @property
+    def primary(self):
+        """Returns the index of each frame's primary face in the face columns, -1 if none"""
+        return np.where(self.face_count > 0, self.face_start, -1)
+
+    def faces(self, i):
+        """Returns the slice of the face columns belonging to frame i"""
+        start = int(self.face_start[i])
+        return slice(start, start + int(self.face_count[i]))
@@ -0,0 +1,25 @@
+import csv
+
+
+def load_labels(path):
+    """Loads labelled attention intervals from a CSV file.
+
+    The file has a header row with the columns start, end (seconds from the
+    beginning of the recording) and attentive (1 if the user was looking at
+    the screen, 0 otherwise). Returns a list of (start, end, attentive) tuples
+    sorted by start time.
+    """
+    labels = []
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            labels.append((float(row["start"]), float(row["end"]), row["attentive"].strip() in ("1", "true", "True")))
+    labels.sort()
+    return labels
+
+
+def label_at(labels, t):
+    """Returns whether the user was attentive at time t, or None if t is not labelled"""
+    for start, end, attentive in labels:
+        if start <= t < end:
+            return attentive
+    return None
@@ -0,0 +1,119 @@
+import collections
+import logging
+import time
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyTracker(object):
+    """
+    This class records, from monotonic capture timestamps, how long a frame
+    takes to produce a detection result (capture -> result) and how long the
+    screen takes to lock once the user looks away (look-away -> lock).
+
+    The user looked away somewhere between the last detection that found
+    them attentive and the first one that found them away, so each lock
+    gets two bounds: from the capture of the last attentive detection
+    (upper bound, which includes the detection interval) and from the
+    capture of the first away detection (lower bound). The SLO applies to
+    the upper bound. Latencies above the configured SLOs are reported to
+    the on_breach callback as event dicts and logged.
+    """
+
+    def __init__(self, lock_slo=None, result_slo=None, on_breach=None, window=1000):
+        """
+        Arguments:
+            lock_slo (float): Look-away -> lock SLO in seconds, None to disable
+            result_slo (float): Capture -> result SLO in seconds, None to disable
+            on_breach (callable): Called with an event dict when an SLO is breached
+            window (int): Number of most recent samples kept per distribution
+        """
+        self.lock_slo = lock_slo
+        self.result_slo = result_slo
+        self.on_breach = on_breach
+        self.capture_to_result = collections.deque(maxlen=window)
+        self.lookaway_to_lock = collections.deque(maxlen=window)
+        self.lookaway_to_lock_min = collections.deque(maxlen=window)
+        self.breaches = 0
+        self._attentive_at = None
+        self._away_since = None
+        self._locked = False
+
+    def reset(self):
+        """Forgets the look-away in progress, keeping the recorded distributions"""
+        self._attentive_at = None
+        self._away_since = None
+        self._locked = False
+
+    def record_result(self, captured_at, done_at=None):
+        """Records the capture -> result latency of a detection"""
+        done_at = time.monotonic() if done_at is None else done_at
+        latency = done_at - captured_at
+        self.capture_to_result.append(latency)
+        if self.result_slo is not None and latency > self.result_slo:
+            self._breach('capture_to_result', latency, self.result_slo, captured_at)
+        return latency
+
+    def record_decision(self, captured_at, away, locked, decided_at=None):
+        """Records a lock decision and returns the look-away -> lock latency
+        (upper bound) when this decision locks the screen after the user
+        looked away. Without an attentive detection before the look-away,
+        both bounds start at the first away detection. A detection whose
+        attention is unknown neither ends nor starts a look-away, since the
+        user may already be gone.
+
+        Arguments:
+            captured_at (float): Capture timestamp of the frame the decision is based on
+            away (bool): Whether this detection found the user away, None if unknown
+            locked (bool): The lock decision
+            decided_at (float): Time of the decision, now by default
+        """
+        decided_at = time.monotonic() if decided_at is None else decided_at
+        latency = None
+        if away is None:
+            pass
+        elif not away:
+            self._away_since = None
+            self._attentive_at = captured_at
+        elif self._away_since is None and not self._locked:
+            self._away_since = captured_at
+
+        if locked and not self._locked and self._away_since is not None:
+            since = self._attentive_at if self._attentive_at is not None else self._away_since
+            latency = decided_at - since
+            self.lookaway_to_lock.append(latency)
+            self.lookaway_to_lock_min.append(decided_at - self._away_since)
+            if self.lock_slo is not None and latency > self.lock_slo:
+                self._breach('lookaway_to_lock', latency, self.lock_slo, since)
+            self._away_since = None
+        self._locked = locked
+        return latency
+
+    def summary(self):
+        """Returns count, p50, p95, p99 and max of each distribution, in seconds;
+        lookaway_to_lock is the upper bound and lookaway_to_lock_min the lower one"""
+        def describe(samples):
+            if not samples:
+                return {'count': 0}
+            values = np.fromiter(samples, dtype=np.float64)
+            p50, p95, p99 = np.percentile(values, [50, 95, 99])
+            return {'count': len(values), 'p50': float(p50), 'p95': float(p95), 'p99': float(p99),
+                    'max': float(values.max())}
+
+        return {
+            'capture_to_result': describe(self.capture_to_result),
+            'lookaway_to_lock': describe(self.lookaway_to_lock),
+            'lookaway_to_lock_min': describe(self.lookaway_to_lock_min),
+            'breaches': self.breaches,
+        }
+
+    def _breach(self, kind, latency, slo, since):
+        self.breaches += 1
+        event = {'kind': kind, 'latency': latency, 'slo': slo, 'since': since}
+        logger.warning("Latency SLO breached: %s took %.3fs (SLO %.3fs)", kind, latency, slo)
+        if self.on_breach is not None:
+            try:
+                self.on_breach(event)
+            except Exception:
+                logger.exception("Latency SLO breach handler failed")
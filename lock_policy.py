@@ -0,0 +1,58 @@
+class LockPolicy(object):
+    """
+    This class turns the attention measured on successive detections
+    into a lock decision. It holds no UI state so the same decisions can
+    be replayed offline from a recorded trace.
+    """
+
+    def __init__(self, low_threshold=40.0, required_consecutive=2, onlooker_threshold=50.0, single_face_floor=50.0,
+                 blink_threshold=None):
+        self.low_threshold = low_threshold  # percent
+        self.required_consecutive = required_consecutive
+        self.onlooker_threshold = onlooker_threshold  # percent
+        self.single_face_floor = single_face_floor  # percent, applied when exactly one face is seen
+        # detections where the user blinks (blinking ratio above this) are ignored; None disables it
+        self.blink_threshold = blink_threshold
+        self.consecutive_low_count = 0
+        self.onlooker_detected = False
+        self.attention = None
+        self.locked = False
+
+    def reset(self):
+        """Forgets the detections seen so far"""
+        self.consecutive_low_count = 0
+        self.onlooker_detected = False
+        self.attention = None
+        self.locked = False
+
+    def update(self, attention, one_face=False, onlooker_attention=(), blink_ratio=None):
+        """Takes the result of a detection into account and returns
+        true if the screen should be locked.
+
+        An unknown attention (None) neither counts as low nor resets the
+        count of consecutive low detections.
+
+        Arguments:
+            attention (float): Attention percentage of the user, None if unknown
+            one_face (bool): Whether exactly one face was seen
+            onlooker_attention (list): Attention percentage of every onlooker
+            blink_ratio (float): Blinking ratio of the user, None if unknown
+        """
+        if self.blink_threshold is not None and blink_ratio is not None and blink_ratio > self.blink_threshold:
+            # Pupils are unreliable while blinking: keep the previous decision
+            return self.locked
+
+        if attention is not None and one_face and self.single_face_floor is not None:
+            attention = max(attention, self.single_face_floor)
+        self.attention = attention
+        self.onlooker_detected = any(a >= self.onlooker_threshold for a in onlooker_attention)
+
+        if attention is None:
+            pass
+        elif attention < self.low_threshold:
+            self.consecutive_low_count += 1
+        else:
+            self.consecutive_low_count = 0
+
+        self.locked = self.consecutive_low_count >= self.required_consecutive or self.onlooker_detected
+        return self.locked
@@ -0,0 +1,94 @@
+"""Recomputes attention and lock decisions from a recorded trace.
+
+Usage:
+    python rescore.py trace_dir --threshold 0.16 --low-threshold 40 --required-consecutive 2
+
+No pixels are touched: attention comes from the recorded pupil positions and
+eye centers, and lock decisions from the same LockPolicy PrivacyApp uses, so
+tuning the formula or the thresholds takes seconds instead of a dlib rerun.
+"""
+import argparse
+import time
+import numpy as np
+from gaze_tracking import Trace
+from gaze_tracking.landmarks import blinking_ratios
+from gaze_detect import attention_scores
+from lock_policy import LockPolicy
+
+
+def rescore(trace, threshold=0.16, low_threshold=40.0, required_consecutive=2, onlooker_threshold=50.0,
+            single_face_floor=50.0, fallback=0.6, blink_threshold=None, gaze_interval=None):
+    """Returns the attention of the primary user and the lock decision of
+    every frame of the trace, as two (F,) arrays.
+
+    With a gaze_interval, only the frames whose index is a multiple of it are
+    re-scored, as if detection had run every gaze_interval frames: the other
+    frames get a NaN attention and keep the lock decision in force. Traces
+    must be recorded with a finer interval for this to be meaningful.
+
+    Arguments:
+        trace (Trace): Recorded trace
+        threshold, fallback (float): Attention formula, see gaze_detect.attention_scores
+        low_threshold, required_consecutive, onlooker_threshold, single_face_floor,
+        blink_threshold: LockPolicy settings
+        gaze_interval (int): Run detection every N frames, None to use every recorded frame
+    """
+    # Attention of every recorded face in one vectorized pass
+    with np.errstate(invalid='ignore'):
+        scores = attention_scores(np.asarray(trace.pupils, dtype=np.float64),
+                                  np.asarray(trace.centers, dtype=np.float64), threshold, fallback)
+    scores = np.nan_to_num(scores, nan=0.0)
+    blink = blinking_ratios(np.asarray(trace.landmarks)).mean(axis=-1) if blink_threshold is not None else None
+
+    policy = LockPolicy(low_threshold, required_consecutive, onlooker_threshold, single_face_floor, blink_threshold)
+    face_start = np.asarray(trace.face_start)
+    face_count = np.asarray(trace.face_count)
+    one_face = np.asarray(trace.one_face)
+    if gaze_interval:
+        selected = np.asarray(trace.frame_index) % gaze_interval == 0
+    else:
+        selected = np.ones(len(trace), dtype=bool)
+    attention = np.full(len(trace), np.nan)
+    locked = np.zeros(len(trace), dtype=bool)
+
+    for i in range(len(trace)):
+        if selected[i]:
+            start, count = face_start[i], face_count[i]
+            attention[i] = scores[start] if count else 0.0
+            blink_ratio = blink[start] if blink is not None and count else None
+            policy.update(attention[i], one_face[i], scores[start + 1:start + count], blink_ratio)
+        locked[i] = policy.locked
+
+    return attention, locked
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompute attention and lock decisions from a trace")
+    parser.add_argument("trace", help="Trace directory recorded with PRIVACY_TRACE")
+    parser.add_argument("--threshold", type=float, default=0.16)
+    parser.add_argument("--low-threshold", type=float, default=40.0)
+    parser.add_argument("--required-consecutive", type=int, default=2)
+    parser.add_argument("--onlooker-threshold", type=float, default=50.0)
+    parser.add_argument("--fallback", type=float, default=0.6)
+    parser.add_argument("--blink-threshold", type=float, default=None)
+    parser.add_argument("--gaze-interval", type=int, default=None)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    trace = Trace(args.trace)
+    attention, locked = rescore(trace, args.threshold, args.low_threshold, args.required_consecutive,
+                                args.onlooker_threshold, fallback=args.fallback,
+                                blink_threshold=args.blink_threshold, gaze_interval=args.gaze_interval)
+    elapsed = time.perf_counter() - start
+
+    lock_events = int(np.count_nonzero(locked[1:] & ~locked[:-1]) + (locked[0] if len(locked) else 0))
+    detections = int(np.count_nonzero(~np.isnan(attention)))
+    print(f"detections:      {detections}")
+    print(f"mean attention:  {np.nanmean(attention) if detections else 0.0:.1f}%")
+    print(f"locked:          {locked.mean() if len(locked) else 0.0:.1%} of frames")
+    print(f"lock events:     {lock_events}")
+    print(f"re-scored in     {elapsed:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,333 @@
+"""Monitors several camera streams from one server.
+
+Usage:
+    python stream_server.py 0 1 rtsp://kiosk-2/stream --workers 4 --profile balanced
+
+Every stream gets its own capture thread and LockPolicy. Detections run on a
+pool of worker processes, so the dlib stages, which hold the GIL, scale with
+cores. Each worker loads the dlib and cascade models once and keeps the
+GazeDetector (and so the calibration) of the streams assigned to it. Streams
+are served round-robin with at most one detection in flight each, and each
+keeps only its newest few frames, so a slow or busy stream drops its own
+stale frames instead of delaying the others.
+"""
+import argparse
+import collections
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import cv2
+from gaze_detect import GazeDetector
+from gaze_tracking import get_profile, load_models
+from lock_policy import LockPolicy
+from latency import LatencyTracker
+
+logger = logging.getLogger(__name__)
+
+
+class StreamMetrics(object):
+    """Counters and last results of one stream"""
+
+    def __init__(self):
+        self.captured = 0
+        self.dropped = 0
+        self.processed = 0
+        self.degraded = 0
+        self.absent = 0
+        self.errors = 0
+        self.latency_total = 0.0
+        self.last_latency = None
+        self.last_attention = None
+        self.locked = False
+
+    def as_dict(self):
+        return {
+            'captured': self.captured,
+            'dropped': self.dropped,
+            'processed': self.processed,
+            'degraded': self.degraded,
+            'absent': self.absent,
+            'errors': self.errors,
+            'mean_latency': self.latency_total / self.processed if self.processed else None,
+            'last_latency': self.last_latency,
+            'last_attention': self.last_attention,
+            'locked': self.locked,
+        }
+
+
+class Stream(object):
+    """
+    This class holds the state of one camera source: its pending frames,
+    its detection state and its metrics.
+    """
+
+    def __init__(self, name, source, worker, queue_size, latency):
+        self.name = name
+        self.source = source
+        # index of the worker process holding this stream's GazeDetector
+        self.worker = worker
+        self.lock_policy = LockPolicy()
+        self.latency = latency
+        self.metrics = StreamMetrics()
+        # newest frames waiting for detection; the oldest is dropped when full
+        self.pending = collections.deque(maxlen=queue_size)
+        self.in_flight = False
+        self.frame_counter = 0
+        self.thread = None
+
+
+def _worker_main(tasks, results, detector_options):
+    """Runs the detections of the streams assigned to one worker process.
+
+    The models are loaded once per process, and each stream gets its own
+    GazeDetector on its first frame.
+    """
+    models = load_models()
+    detectors = {}
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        name, frame_counter, captured_at, frame = task
+        try:
+            detector = detectors.get(name)
+            if detector is None:
+                detector = detectors[name] = GazeDetector(models=models, **detector_options)
+            results.put((name, frame_counter, captured_at, detector.detect(frame, frame_counter, captured_at)))
+        except Exception:
+            logger.exception("Detection failed on stream %s frame %d", name, frame_counter)
+            results.put((name, frame_counter, captured_at, None))
+
+
+class StreamServer(object):
+    """
+    This class serves N camera sources with a pool of detection worker
+    processes, each loading the models once. Streams are spread evenly over
+    the workers and stay on theirs, which keeps their detection state.
+    """
+
+    def __init__(self, sources, workers=None, profile=None, multi_face=True, queue_size=2, on_result=None,
+                 lock_slo=None, on_breach=None, presence=True):
+        """
+        Arguments:
+            sources (list): Camera indices, video files or stream URLs
+            workers (int): Number of detection worker processes, the number of cores
+                (at most the number of sources) by default
+            profile: Profile name or Profile used by every stream
+            multi_face (bool): Whether onlookers are analyzed
+            queue_size (int): Frames kept per stream while waiting for a worker
+            on_result (callable): Called with (stream name, GazeResult, locked) after each detection
+            lock_slo (float): Look-away -> lock latency SLO in seconds, None to disable
+            on_breach (callable): Called with (stream name, event dict) when the SLO is breached
+            presence (bool): Skip the analysis of frames showing an empty scene
+        """
+        self.profile = get_profile(profile)
+        self.workers = max(1, min(workers or os.cpu_count() or 1, len(sources)))
+        self.on_result = on_result
+        self.streams = []
+        for i, source in enumerate(sources):
+            name = str(source) if sources.count(source) == 1 else f"{source}#{i}"
+            latency = LatencyTracker(lock_slo=lock_slo, on_breach=self._breach_handler(name, on_breach))
+            self.streams.append(Stream(name, source, i % self.workers, queue_size, latency))
+        self._detector_options = {'multi_face': multi_face, 'profile': self.profile, 'save_frames': False,
+                                  'presence': presence}
+
+        self._cond = threading.Condition()
+        self._running = False
+        # detections in flight on each worker
+        self._busy = [0] * self.workers
+        self._next = 0
+        self._processes = []
+        self._tasks = []
+        self._results = None
+        self._scheduler = None
+        self._collector = None
+
+    def start(self):
+        """Opens the sources and starts capturing and detecting"""
+        self._running = True
+        # spawn rather than fork: the server may already run threads (e.g. inside an app)
+        context = multiprocessing.get_context('spawn')
+        self._results = context.Queue()
+        for i in range(self.workers):
+            tasks = context.Queue()
+            process = context.Process(target=_worker_main, args=(tasks, self._results, self._detector_options),
+                                      name=f'gaze-{i}', daemon=True)
+            process.start()
+            self._tasks.append(tasks)
+            self._processes.append(process)
+        self._collector = threading.Thread(target=self._collect, name='collector', daemon=True)
+        self._collector.start()
+        for stream in self.streams:
+            stream.thread = threading.Thread(target=self._capture, args=(stream,), name=f'capture-{stream.name}', daemon=True)
+            stream.thread.start()
+        self._scheduler = threading.Thread(target=self._schedule, name='scheduler', daemon=True)
+        self._scheduler.start()
+
+    def stop(self):
+        """Stops capturing and waits for the running detections"""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        for stream in self.streams:
+            if stream.thread is not None:
+                stream.thread.join()
+        if self._scheduler is not None:
+            self._scheduler.join()
+        # Workers finish their queued detections before the sentinel
+        for tasks in self._tasks:
+            tasks.put(None)
+        for process in self._processes:
+            process.join()
+        if self._collector is not None:
+            self._results.put(None)
+            self._collector.join()
+        self._processes, self._tasks = [], []
+
+    def metrics(self):
+        """Returns the metrics of every stream, keyed by stream name"""
+        with self._cond:
+            metrics = {}
+            for stream in self.streams:
+                metrics[stream.name] = stream.metrics.as_dict()
+                metrics[stream.name]['latency'] = stream.latency.summary()
+            return metrics
+
+    @staticmethod
+    def _breach_handler(name, on_breach):
+        if on_breach is None:
+            return None
+        return lambda event: on_breach(name, event)
+
+    def _capture(self, stream):
+        cap = cv2.VideoCapture(stream.source)
+        if not cap.isOpened():
+            logger.error("Could not open source %s", stream.name)
+            return
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.profile.video_width)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.profile.video_height)
+
+        try:
+            while self._running:
+                ret, frame = cap.read()
+                if not ret:
+                    if isinstance(stream.source, int):
+                        # Cameras sometimes fail the first frames
+                        time.sleep(0.05)
+                        continue
+                    logger.info("Source %s ended", stream.name)
+                    break
+
+                stream.metrics.captured += 1
+                if stream.frame_counter % self.profile.gaze_interval == 0:
+                    captured_at = time.monotonic()
+                    frame = cv2.resize(frame, (self.profile.video_width, self.profile.video_height))
+                    with self._cond:
+                        if len(stream.pending) == stream.pending.maxlen:
+                            stream.metrics.dropped += 1
+                        stream.pending.append((stream.frame_counter, captured_at, frame))
+                        self._cond.notify_all()
+                stream.frame_counter += 1
+        finally:
+            cap.release()
+
+    def _pick(self):
+        """Returns the next stream with a pending frame, no detection in flight
+        and an idle worker, round-robin"""
+        n = len(self.streams)
+        for k in range(n):
+            i = (self._next + k) % n
+            stream = self.streams[i]
+            if stream.pending and not stream.in_flight and not self._busy[stream.worker]:
+                self._next = (i + 1) % n
+                return stream
+
+    def _schedule(self):
+        while True:
+            with self._cond:
+                stream = None
+                while self._running:
+                    stream = self._pick()
+                    if stream is not None:
+                        break
+                    self._cond.wait()
+                if not self._running:
+                    return
+                frame_counter, captured_at, frame = stream.pending.popleft()
+                stream.in_flight = True
+                self._busy[stream.worker] += 1
+            self._tasks[stream.worker].put((stream.name, frame_counter, captured_at, frame))
+
+    def _collect(self):
+        streams = {stream.name: stream for stream in self.streams}
+        while True:
+            item = self._results.get()
+            if item is None:
+                return
+            name, frame_counter, captured_at, result = item
+            self._process(streams[name], frame_counter, captured_at, result)
+
+    def _process(self, stream, frame_counter, captured_at, result):
+        try:
+            if result is None:
+                # The worker process has logged the failure
+                with self._cond:
+                    stream.metrics.errors += 1
+                return
+            locked = stream.lock_policy.update(result.attention, result.one_face, result.onlooker_attention,
+                                               result.blink_ratio)
+            with self._cond:
+                latency = stream.latency.record_result(captured_at)
+                # An unknown attention must not pass for an attentive user
+                away = None if result.attention is None else stream.lock_policy.consecutive_low_count > 0
+                stream.latency.record_decision(captured_at, away, locked)
+                metrics = stream.metrics
+                metrics.processed += 1
+                metrics.degraded += result.degradation > 0
+                metrics.absent += not result.present
+                metrics.latency_total += latency
+                metrics.last_latency = latency
+                metrics.last_attention = stream.lock_policy.attention
+                metrics.locked = locked
+            if self.on_result is not None:
+                self.on_result(stream.name, result, locked)
+        except Exception:
+            logger.exception("Detection failed on stream %s frame %d", stream.name, frame_counter)
+            with self._cond:
+                stream.metrics.errors += 1
+        finally:
+            with self._cond:
+                stream.in_flight = False
+                self._busy[stream.worker] -= 1
+                self._cond.notify_all()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monitor several camera streams from one process")
+    parser.add_argument("sources", nargs="+", help="Camera indices, video files or stream URLs")
+    parser.add_argument("--workers", type=int, default=None, help="Detection worker processes (default: number of cores)")
+    parser.add_argument("--profile", default=None, help="Speed/accuracy profile")
+    parser.add_argument("--interval", type=float, default=5.0, help="Seconds between metrics reports")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    sources = [int(s) if s.isdigit() else s for s in args.sources]
+    server = StreamServer(sources, workers=args.workers, profile=args.profile)
+    server.start()
+    try:
+        while True:
+            time.sleep(args.interval)
+            for name, m in server.metrics().items():
+                latency = f"{1000 * m['mean_latency']:.0f}ms" if m['mean_latency'] is not None else "n/a"
+                logger.info("%s: processed=%d dropped=%d errors=%d latency=%s attention=%s locked=%s",
+                            name, m['processed'], m['dropped'], m['errors'], latency, m['last_attention'], m['locked'])
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
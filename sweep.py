@@ -0,0 +1,149 @@
+"""Sweeps the lock and attention parameters over labelled sessions.
+
+Usage:
+    python sweep.py --session trace_dir:labels.csv --session ... \\
+        --threshold 0.12 0.16 0.2 --low-threshold 30 40 50 \\
+        --required-consecutive 1 2 3 --gaze-interval 10 20 30 \\
+        --blink-threshold none 3.8 4.5 --random 200 --output results.csv
+
+Each session is a trace recorded with PRIVACY_TRACE and a CSV of labelled
+attention intervals (see labels.py), whose times count from the first traced
+frame. Every parameter set of the grid (or a random sample of it) is
+re-scored on every session across a process pool, without touching pixels,
+and the Pareto front of false-lock rate, time to lock and CPU cost is printed.
+
+- false-lock rate: share of the frames labelled attentive where the screen is locked
+- time to lock: mean delay between the start of an away interval and the lock,
+  the whole interval counting for intervals where the screen never locks
+- CPU cost: detection CPU seconds per second of session, from the traced CPU time
+"""
+import argparse
+import concurrent.futures
+import csv
+import itertools
+import random
+import numpy as np
+from gaze_tracking import Trace
+from labels import load_labels, label_at
+from rescore import rescore
+
+# Swept parameters and their current values
+PARAMETERS = {
+    'threshold': 0.16,
+    'fallback': 0.6,
+    'low_threshold': 40.0,
+    'required_consecutive': 2,
+    'gaze_interval': None,
+    'blink_threshold': None,
+}
+
+OBJECTIVES = ['false_lock_rate', 'time_to_lock', 'cpu_cost']
+
+# Sessions loaded once per worker process
+_sessions = None
+
+
+def load_session(spec):
+    """Loads a (Trace, labels) pair from a 'trace_dir:labels.csv' spec"""
+    trace_path, labels_path = spec.rsplit(':', 1)
+    return Trace(trace_path), load_labels(labels_path)
+
+
+def _init_worker(specs):
+    global _sessions
+    _sessions = [load_session(spec) for spec in specs]
+
+
+def evaluate_session(trace, labels, params):
+    """Re-scores one session and returns the raw counts of its objectives"""
+    attention, locked = rescore(trace, **params)
+    t = np.asarray(trace.timestamp) - trace.timestamp[0]
+    attentive = np.array([label_at(labels, ti) is True for ti in t], dtype=bool)
+    delays = []
+    for start, end, is_attentive in labels:
+        if is_attentive:
+            continue
+        inside = (t >= start) & (t < end)
+        hits = np.flatnonzero(inside & locked)
+        delays.append(t[hits[0]] - start if len(hits) else end - start)
+
+    detected = ~np.isnan(attention)
+    return {
+        'attentive': int(np.count_nonzero(attentive)),
+        'false_locked': int(np.count_nonzero(attentive & locked)),
+        'delays': delays,
+        'cpu': float(np.sum(np.asarray(trace.cpu_time)[detected])),
+        'duration': float(t[-1]) if len(t) else 0.0,
+    }
+
+
+def evaluate(params):
+    """Returns the objectives of a parameter set over all the sessions"""
+    counts = [evaluate_session(trace, labels, params) for trace, labels in _sessions]
+    attentive = sum(c['attentive'] for c in counts)
+    delays = [d for c in counts for d in c['delays']]
+    duration = sum(c['duration'] for c in counts)
+
+    result = dict(params)
+    result['false_lock_rate'] = sum(c['false_locked'] for c in counts) / attentive if attentive else 0.0
+    result['time_to_lock'] = float(np.mean(delays)) if delays else 0.0
+    result['cpu_cost'] = sum(c['cpu'] for c in counts) / duration if duration else float('nan')
+    return result
+
+
+def pareto_front(results, objectives=OBJECTIVES):
+    """Returns the results not dominated on the objectives (all minimized)"""
+    def dominates(a, b):
+        pairs = [(a[k], b[k]) for k in objectives if not (np.isnan(a[k]) or np.isnan(b[k]))]
+        return all(x <= y for x, y in pairs) and any(x < y for x, y in pairs)
+
+    return [r for r in results if not any(dominates(other, r) for other in results)]
+
+
+def _optional(cast):
+    def parse(value):
+        return None if value.lower() == 'none' else cast(value)
+    return parse
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep the lock and attention parameters over labelled sessions")
+    parser.add_argument("--session", action="append", required=True, help="trace_dir:labels.csv, repeatable")
+    parser.add_argument("--threshold", type=float, nargs="+", default=[PARAMETERS['threshold']])
+    parser.add_argument("--fallback", type=float, nargs="+", default=[PARAMETERS['fallback']])
+    parser.add_argument("--low-threshold", type=float, nargs="+", default=[PARAMETERS['low_threshold']])
+    parser.add_argument("--required-consecutive", type=int, nargs="+", default=[PARAMETERS['required_consecutive']])
+    parser.add_argument("--gaze-interval", type=_optional(int), nargs="+", default=[PARAMETERS['gaze_interval']])
+    parser.add_argument("--blink-threshold", type=_optional(float), nargs="+", default=[PARAMETERS['blink_threshold']])
+    parser.add_argument("--random", type=int, default=None, help="Evaluate N random parameter sets of the grid")
+    parser.add_argument("--processes", type=int, default=None, help="Worker processes (default: number of cores)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="CSV file to write every result to")
+    args = parser.parse_args()
+
+    values = [getattr(args, name) for name in PARAMETERS]
+    grid = [dict(zip(PARAMETERS, combination)) for combination in itertools.product(*values)]
+    if args.random is not None and args.random < len(grid):
+        grid = random.Random(args.seed).sample(grid, args.random)
+    print(f"Evaluating {len(grid)} parameter sets on {len(args.session)} sessions")
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=args.processes, initializer=_init_worker,
+                                                initargs=(args.session,)) as pool:
+        results = list(pool.map(evaluate, grid, chunksize=max(1, len(grid) // 64)))
+
+    if args.output:
+        with open(args.output, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(PARAMETERS) + OBJECTIVES)
+            writer.writeheader()
+            writer.writerows(results)
+
+    front = sorted(pareto_front(results), key=lambda r: (r['false_lock_rate'], r['time_to_lock']))
+    print(f"Pareto front ({len(front)} of {len(results)}):")
+    print("".join(f"{name:>22}" for name in list(PARAMETERS) + OBJECTIVES))
+    for r in front:
+        print("".join(f"{str(r[name]):>22}" if not isinstance(r[name], float) else f"{r[name]:>22.4g}"
+                      for name in list(PARAMETERS) + OBJECTIVES))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The tools (gaze_detect, rescore, sweep, ...) are top-level modules of the repository
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
@@ -0,0 +1,32 @@
+"""The vectorized attention formula must match the original per-face one."""
+import numpy as np
+from scipy.spatial import distance
+from gaze_detect import attention_scores
+
+
+def original_attention(pupils, centers, threshold=0.16):
+    """The formula getGazeAttention used before it was vectorized"""
+    (center_left, center_right), (pupil_left, pupil_right) = centers, pupils
+    metric_left = distance.euclidean(center_left, pupil_left) / (((center_left[0] ** 2)+(center_left[0] ** 2)) ** 0.5)
+    metric_right = distance.euclidean(center_right, pupil_right) / (((center_right[0] ** 2)+(center_right[0] ** 2)) ** 0.5)
+    metric = (metric_left + metric_right) / 2
+    if metric < threshold:
+        attention_percent = 1.0 - metric
+    else:
+        attention_percent = max(0.6 - metric, 0.0)
+    return attention_percent * 100
+
+
+def test_attention_scores_match_original_formula():
+    rng = np.random.default_rng(0)
+    centers = rng.integers(10, 40, size=(500, 2, 2)) / 2
+    pupils = rng.integers(0, 80, size=(500, 2, 2)).astype(np.float64)
+    for threshold in (0.1, 0.16, 0.3):
+        expected = [original_attention(p, c, threshold) for p, c in zip(pupils, centers)]
+        np.testing.assert_allclose(attention_scores(pupils, centers, threshold), expected, rtol=1e-12, atol=1e-12)
+
+
+def test_attention_scores_bounds():
+    centers = np.full((1, 2, 2), 15.0)
+    assert attention_scores(centers.copy(), centers)[0] == 100.0
+    assert attention_scores(centers + 100, centers)[0] == 0.0
@@ -0,0 +1,61 @@
+from latency import LatencyTracker
+
+
+def test_lookaway_to_lock_bounds():
+    tracker = LatencyTracker()
+    # Detections 1 s apart: attentive at t=0, away at t=1 and t=2, locked by the t=2 detection
+    assert tracker.record_decision(0.0, away=False, locked=False, decided_at=0.1) is None
+    assert tracker.record_decision(1.0, away=True, locked=False, decided_at=1.1) is None
+    assert tracker.record_decision(2.0, away=True, locked=True, decided_at=2.1) == 2.1
+
+    summary = tracker.summary()
+    assert summary['lookaway_to_lock']['max'] == 2.1
+    assert summary['lookaway_to_lock_min']['max'] == 1.1
+
+
+def test_lock_slo_applies_to_the_upper_bound():
+    breaches = []
+    tracker = LatencyTracker(lock_slo=1.5, on_breach=breaches.append)
+    tracker.record_decision(0.0, away=False, locked=False, decided_at=0.1)
+    tracker.record_decision(1.0, away=True, locked=True, decided_at=1.1)
+    assert tracker.breaches == 0
+
+    tracker.record_decision(2.0, away=False, locked=False, decided_at=2.1)
+    tracker.record_decision(3.0, away=True, locked=False, decided_at=3.1)
+    tracker.record_decision(4.0, away=True, locked=True, decided_at=4.1)
+    assert tracker.breaches == 1
+    assert breaches[0]['kind'] == 'lookaway_to_lock'
+    assert breaches[0]['since'] == 2.0
+
+
+def test_lock_without_attentive_detection_starts_at_first_away():
+    tracker = LatencyTracker()
+    tracker.record_decision(5.0, away=True, locked=False, decided_at=5.1)
+    assert tracker.record_decision(6.0, away=True, locked=True, decided_at=6.2) == 6.2 - 5.0
+
+
+def test_staying_locked_records_one_lock():
+    tracker = LatencyTracker()
+    tracker.record_decision(0.0, away=False, locked=False, decided_at=0.0)
+    tracker.record_decision(1.0, away=True, locked=True, decided_at=1.0)
+    assert tracker.record_decision(2.0, away=True, locked=True, decided_at=2.0) is None
+    assert tracker.summary()['lookaway_to_lock']['count'] == 1
+
+
+def test_capture_to_result_slo():
+    breaches = []
+    tracker = LatencyTracker(result_slo=0.2, on_breach=breaches.append)
+    assert tracker.record_result(1.0, done_at=1.1) == 1.1 - 1.0
+    tracker.record_result(1.0, done_at=1.5)
+    assert [b['kind'] for b in breaches] == ['capture_to_result']
+    assert tracker.summary()['capture_to_result']['count'] == 2
+
+
+def test_unknown_attention_does_not_count_as_attentive():
+    tracker = LatencyTracker()
+    # Attentive at t=0, unknown at t=1 (the user may be gone), away at t=2, locked at t=3
+    tracker.record_decision(0.0, away=False, locked=False, decided_at=0.0)
+    tracker.record_decision(1.0, away=None, locked=False, decided_at=1.0)
+    tracker.record_decision(2.0, away=True, locked=False, decided_at=2.0)
+    assert tracker.record_decision(3.0, away=True, locked=True, decided_at=3.0) == 3.0
+    assert tracker.summary()['lookaway_to_lock_min']['max'] == 1.0
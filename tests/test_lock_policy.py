@@ -0,0 +1,30 @@
+from lock_policy import LockPolicy
+
+
+def test_locks_after_consecutive_low_detections():
+    policy = LockPolicy(low_threshold=40.0, required_consecutive=2)
+    assert not policy.update(10.0)
+    assert policy.update(10.0)
+    assert not policy.update(90.0)
+
+
+def test_unknown_attention_keeps_the_low_count():
+    policy = LockPolicy(low_threshold=40.0, required_consecutive=2)
+    policy.update(10.0)
+    assert not policy.update(None)
+    assert policy.consecutive_low_count == 1
+    assert policy.update(10.0)
+    assert policy.update(None)
+
+
+def test_onlooker_locks_immediately():
+    policy = LockPolicy(onlooker_threshold=50.0)
+    assert policy.update(90.0, one_face=False, onlooker_attention=[60.0])
+    assert not policy.update(90.0, one_face=False, onlooker_attention=[20.0])
+
+
+def test_blinking_keeps_the_previous_decision():
+    policy = LockPolicy(required_consecutive=1, blink_threshold=4.0)
+    assert policy.update(10.0, blink_ratio=3.0)
+    assert policy.update(90.0, blink_ratio=5.0)
+    assert not policy.update(90.0, blink_ratio=3.0)
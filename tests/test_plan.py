@@ -0,0 +1,51 @@
+from types import SimpleNamespace
+
+import pytest
+
+from gaze_detect import FULL, NO_FACE_COUNT, NO_ANNOTATION, LOW_SCALE, REUSED_LANDMARKS, GazeDetector
+
+
+@pytest.fixture
+def detector():
+    # _plan only reads the stage timings and whether the last landmarks can be reused
+    detector = GazeDetector(save_frames=False, models=SimpleNamespace(), low_scale=0.5, max_reuse=3)
+    detector.gaze = SimpleNamespace(trackable=True)
+    detector.timings.update(detect=0.04, landmarks=0.005, eyes=0.01, count=0.01, annotate=0.02)
+    return detector
+
+
+def test_plan_without_budget_is_full(detector):
+    assert detector._plan(None) == FULL
+
+
+@pytest.mark.parametrize('remaining, level', [
+    (1.0, FULL),
+    (0.08, NO_FACE_COUNT),
+    (0.07, NO_ANNOTATION),
+    (0.05, LOW_SCALE),
+    (0.02, REUSED_LANDMARKS),
+    (0.001, REUSED_LANDMARKS),
+])
+def test_plan_picks_the_most_complete_level_that_fits(detector, remaining, level):
+    assert detector._plan(remaining) == level
+
+
+def test_plan_reuses_landmarks_only_when_allowed(detector):
+    detector.gaze.trackable = False
+    assert detector._plan(0.001) == LOW_SCALE
+    detector.gaze.trackable = True
+    detector._reused = detector.max_reuse
+    assert detector._plan(0.001) == LOW_SCALE
+
+
+def test_one_slow_sample_does_not_skip_a_stage_for_good(detector):
+    detector.timings.update(detect=0.05, landmarks=0.005, eyes=0.01, count=0.0, annotate=0.0)
+    detector._update_timing('annotate', 0.5)  # one slow annotation
+    assert detector._plan(0.095) == NO_ANNOTATION
+
+    skipped = 0
+    while detector._plan(0.095) == NO_ANNOTATION:
+        detector._skip_timing('annotate')
+        skipped += 1
+        assert skipped < 20
+    assert detector._plan(0.095) == FULL
@@ -0,0 +1,48 @@
+import numpy as np
+
+from gaze_tracking import PresenceDetector
+
+
+def _scene(level, seed=0):
+    rng = np.random.default_rng(seed)
+    scene = (rng.random((120, 160, 3)) * 60 + level).astype(np.uint8)
+
+    def frame():
+        return scene + rng.integers(0, 3, scene.shape, dtype=np.uint8)
+    return frame
+
+
+def _run(presence, frame, start, seconds, present=False, step=1.0):
+    """Feeds one frame per step seconds, as the app does, and returns the number of skipped frames"""
+    skipped = 0
+    for i in range(int(seconds / step)):
+        now = start + i * step
+        if presence.is_empty(frame(), now):
+            skipped += 1
+        else:
+            presence.update(present, now)
+    return skipped
+
+
+def test_empty_scene_is_skipped_between_rechecks():
+    presence = PresenceDetector()
+    skipped = _run(presence, _scene(40), 0.0, 200.0)
+    # settle (30 s) and warmup (10 full analyses) first, then a full analysis every recheck_interval
+    assert 100 < skipped < 160
+
+
+def test_changed_empty_scene_is_relearned():
+    presence = PresenceDetector()
+    assert _run(presence, _scene(40), 0.0, 200.0) > 0
+    # The light goes on: the empty desk no longer matches the model, and nobody shows up
+    assert _run(presence, _scene(150, seed=1), 200.0, 200.0) > 100
+
+
+def test_face_keeps_the_scene_out_of_the_model():
+    presence = PresenceDetector()
+    assert _run(presence, _scene(40), 0.0, 200.0) > 0
+    frame = _scene(150, seed=1)
+    # Someone is found now and then: the new scene is never learned nor skipped
+    for start in range(200, 600, 20):
+        assert _run(presence, frame, start, 19.0) == 0
+        assert _run(presence, frame, start + 19.0, 1.0, present=True) == 0
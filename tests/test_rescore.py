@@ -0,0 +1,76 @@
+"""Re-scoring a recorded trace must reproduce the live attention and lock
+decisions exactly: the trace stores what the live path decided on and
+rescore runs the same formula and LockPolicy on it."""
+from types import SimpleNamespace
+import dlib
+import numpy as np
+import pytest
+from gaze_tracking import Trace, TraceWriter
+from gaze_tracking.calibration import Calibration
+from gaze_tracking.face import Face
+from gaze_detect import face_attention
+from lock_policy import LockPolicy
+from rescore import rescore
+
+# Eye contour of the 68-point model, as fractions of the face width
+EYE = [(0.0, 0.5), (0.1, 0.4), (0.2, 0.4), (0.3, 0.5), (0.2, 0.6), (0.1, 0.6)]
+
+
+def make_face(rng, frame, calibration, calibrate):
+    left, top = int(rng.integers(10, 380)), int(rng.integers(10, 200))
+    width = int(rng.integers(90, 160))
+    openness = rng.uniform(0.2, 0.6)
+    landmarks = np.zeros((68, 2), dtype=np.int32)
+    for i, (dx, dy) in enumerate(EYE):
+        y = top + 0.3 * width + (dy - 0.5) * openness * width
+        landmarks[36 + i] = (left + 0.15 * width + dx * width, y)
+        landmarks[42 + i] = (left + 0.55 * width + dx * width, y)
+    rect = dlib.rectangle(left, top, left + width, top + width)
+    return Face(frame, rect, landmarks, calibration, calibrate)
+
+
+def live_session(path, frames=60, seed=0, blink_threshold=4.0, gaze_interval=None):
+    """Runs the live decision path (as GazeDetector.detect and PrivacyApp do)
+    on synthetic faces, records it, and returns the live attention and locks"""
+    rng = np.random.default_rng(seed)
+    calibration = Calibration()
+    policy = LockPolicy(40.0, 2, 50.0, 50.0, blink_threshold)
+    attention = np.full(frames, np.nan)
+    locked = np.zeros(frames, dtype=bool)
+
+    with TraceWriter(path, multi_face=True) as writer:
+        for i in range(frames):
+            frame = (rng.random((400, 600)) * 255).astype(np.uint8)
+            faces = [make_face(rng, frame, calibration, j == 0) for j in range(rng.integers(0, 4))]
+            one_face = len(faces) == 1
+            scores = face_attention(faces)
+            writer.append(i, i / 30.0, SimpleNamespace(calibration=calibration, faces=faces), one_face)
+            if gaze_interval is None or i % gaze_interval == 0:
+                attention[i] = scores[0] if scores else 0.0
+                blink_ratio = faces[0].blinking_ratio if faces else None
+                policy.update(attention[i], one_face, scores[1:], blink_ratio)
+            locked[i] = policy.locked
+    return attention, locked
+
+
+@pytest.mark.parametrize('blink_threshold', [None, 4.0])
+@pytest.mark.parametrize('gaze_interval', [None, 3])
+def test_rescore_reproduces_live_decisions(tmp_path, blink_threshold, gaze_interval):
+    path = str(tmp_path / 'trace')
+    attention, locked = live_session(path, blink_threshold=blink_threshold, gaze_interval=gaze_interval)
+    assert locked.any() and not locked.all()
+
+    rescored_attention, rescored_locked = rescore(Trace(path), blink_threshold=blink_threshold,
+                                                  gaze_interval=gaze_interval)
+    np.testing.assert_allclose(rescored_attention, attention, rtol=1e-12)
+    np.testing.assert_array_equal(rescored_locked, locked)
+
+
+def test_trace_round_trip(tmp_path):
+    path = str(tmp_path / 'trace')
+    live_session(path, frames=10)
+    trace = Trace(path)
+    assert len(trace) == 10
+    assert trace.face_start[0] == 0
+    assert (np.diff(trace.face_start) == trace.face_count[:-1]).all()
+    assert trace.landmarks.shape == (int(trace.face_count.sum()), 68, 2)
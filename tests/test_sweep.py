@@ -0,0 +1,22 @@
+import math
+from sweep import pareto_front
+
+
+def result(false_lock_rate, time_to_lock, cpu_cost):
+    return {'false_lock_rate': false_lock_rate, 'time_to_lock': time_to_lock, 'cpu_cost': cpu_cost}
+
+
+def test_pareto_front_keeps_non_dominated_results():
+    a = result(0.1, 2.0, 0.5)
+    b = result(0.2, 1.0, 0.5)    # trades false locks for time to lock
+    c = result(0.2, 2.0, 0.5)    # dominated by a and b
+    d = result(0.1, 2.0, 0.5)    # equal to a: neither dominates
+    e = result(0.3, 3.0, 0.1)    # cheapest
+    assert pareto_front([a, b, c, d, e]) == [a, b, d, e]
+
+
+def test_pareto_front_ignores_unknown_objectives():
+    # Without a CPU time in the trace the cost is NaN and only the other objectives count
+    a = result(0.1, 2.0, math.nan)
+    b = result(0.2, 2.0, 0.1)
+    assert pareto_front([a, b]) == [a]